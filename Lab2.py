@@ -1,71 +1,91 @@
 import streamlit as st
-from openai import OpenAI
-
-# Show title and description.
-st.title("LAB-02-Karan Shah📄 Document Question Answering")
-st.write(
-    "Upload a document below and ask a question about it – GPT will answer! "
-    "To use this app, you need to provide an OpenAI API key, which you can get [here](https://platform.openai.com/account/api-keys)."
-)
-
-# Fetch the OpenAI API key from Streamlit secrets.
-openai_api_key = st.secrets["openai"]
-
-if not openai_api_key:
-    st.info("Please add your OpenAI API key to continue.", icon="🗝")
-else:
-    # Create an OpenAI client.
-    client = OpenAI(api_key=openai_api_key)
-
-    # Sidebar options
-    st.sidebar.header("Summary Options")
-    summary_option = st.sidebar.selectbox(
-        "Choose a summary type:",
-        ["Summarize in 100 words", "Summarize in 2 connecting paragraphs", "Summarize in 5 bullet points"]
-    )
+from shared_resources import get_llm_gateway, get_summary_cache
+from summarizer import prepare_summary_messages
+from summary_cache import document_sha256
 
-    advanced_model = st.sidebar.checkbox("Use Advanced Model (GPT-4o)")
 
-    # Let the user upload a file via st.file_uploader.
-    uploaded_file = st.file_uploader(
-        "Upload a document (.txt or .md)", type=("txt", "md")
+# Function to render the page (called by streamlit_app.py on every rerun)
+def render():
+    # Show title and description.
+    st.title("LAB-02-Karan Shah📄 Document Question Answering")
+    st.write(
+        "Upload a document below and ask a question about it – GPT will answer! "
+        "To use this app, you need to provide an OpenAI API key, which you can get [here](https://platform.openai.com/account/api-keys)."
     )
 
-    # Ask the user for a question via st.text_area.
-    question = st.text_area(
-        "Now ask a question about the document!",
-        placeholder="Can you give me a short summary?",
-        disabled=not uploaded_file,
-    )
+    # Fetch the OpenAI API key from Streamlit secrets.
+    openai_api_key = st.secrets["openai"]
+
+    if not openai_api_key:
+        st.info("Please add your OpenAI API key to continue.", icon="🗝")
+    else:
+        # Get the LLM gateway shared by all sessions.
+        gateway = get_llm_gateway(openai_api_key)
+
+        # Sidebar options
+        st.sidebar.header("Summary Options")
+        summary_option = st.sidebar.selectbox(
+            "Choose a summary type:",
+            ["Summarize in 100 words", "Summarize in 2 connecting paragraphs", "Summarize in 5 bullet points"]
+        )
+
+        advanced_model = st.sidebar.checkbox("Use Advanced Model (GPT-4o)")
+
+        # Let the user upload a file via st.file_uploader.
+        uploaded_file = st.file_uploader(
+            "Upload a document (.txt or .md)", type=("txt", "md")
+        )
 
-    if uploaded_file and question:
-        # Process the uploaded file and question.
-        document = uploaded_file.read().decode()
-        
-        # Set the model based on the checkbox
-        model = "gpt-4o" if advanced_model else "gpt-4o-mini"
-
-        # Create messages for the API request
-        if summary_option == "Summarize in 100 words":
-            prompt = f"Summarize the following document in 100 words: {document}"
-        elif summary_option == "Summarize in 2 connecting paragraphs":
-            prompt = f"Summarize the following document in 2 connecting paragraphs: {document}"
-        elif summary_option == "Summarize in 5 bullet points":
-            prompt = f"Summarize the following document in 5 bullet points: {document}"
-        
-        messages = [
-            {
-                "role": "user",
-                "content": f"{prompt} \n\n---\n\n {question}",
-            }
-        ]
-
-        # Generate an answer using the OpenAI API.
-        stream = client.chat.completions.create(
-            model=model,
-            messages=messages,
-            stream=True,
+        # Ask the user for a question via st.text_area.
+        question = st.text_area(
+            "Now ask a question about the document!",
+            placeholder="Can you give me a short summary?",
+            disabled=not uploaded_file,
         )
 
-        # Stream the response to the app using st.write_stream.
-        st.write_stream(stream)
+        if uploaded_file and question:
+            # Process the uploaded file and question.
+            document_bytes = uploaded_file.getvalue()
+
+            # Set the model based on the checkbox
+            model = "gpt-4o" if advanced_model else "gpt-4o-mini"
+
+            # Create the instruction for the chosen summary type
+            if summary_option == "Summarize in 100 words":
+                instruction = "Summarize the following document in 100 words"
+            elif summary_option == "Summarize in 2 connecting paragraphs":
+                instruction = "Summarize the following document in 2 connecting paragraphs"
+            elif summary_option == "Summarize in 5 bullet points":
+                instruction = "Summarize the following document in 5 bullet points"
+
+            # Reuse the answer if this document, option, question and model were seen before
+            summary_cache = get_summary_cache()
+            cache_key = (document_sha256(document_bytes), f"{summary_option}\n{question.strip()}", model)
+            answer = summary_cache.get(*cache_key)
+            if answer is not None:
+                st.markdown(answer)
+            else:
+                document = document_bytes.decode()
+
+                # Create messages for the API request (long documents are condensed first, in parallel)
+                progress = st.empty()
+
+                def show_progress(done, total, stage):
+                    progress.progress(done / total, text=f"Condensing a long document ({stage}): {done}/{total}")
+
+                messages = prepare_summary_messages(
+                    gateway, model, document, instruction, question=question, on_progress=show_progress
+                )
+                progress.empty()
+
+                # Generate an answer using the OpenAI API (identical requests in flight are shared).
+                stream = gateway.stream_sync(model=model, messages=messages)
+
+                # Stream the response to the app piece by piece, and cache it.
+                answer_placeholder = st.empty()
+                answer = ""
+                for piece in stream:
+                    answer += piece
+                    answer_placeholder.markdown(answer + "▌")
+                answer_placeholder.markdown(answer)
+                summary_cache.put(*cache_key, answer)
@@ -1,128 +1,145 @@
 import streamlit as st
-from openai import OpenAI
-
-# Show title and description.
-st.title("LAB-03-Karan Shah📄 Document question answering and Chatbot")
-st.write(
-    "Upload a document below and ask a question about it – GPT will answer! "
-    "You can also interact with the chatbot. "
-    "To use this app, you need to provide an OpenAI API key, which you can get [here](https://platform.openai.com/account/api-keys). "
-)
-
-# Fetch the OpenAI API key from Streamlit secrets
-openai_api_key = st.secrets["openai"]
-
-if not openai_api_key:
-    st.info("Please add your OpenAI API key to continue.", icon="🗝")
-else:
-    # Create an OpenAI client
-    client = OpenAI(api_key=openai_api_key)
-
-    # Let the user upload a file via st.file_uploader.
-    uploaded_file = st.file_uploader("Upload a document (.txt or .md)", type=("txt", "md"))
-
-    # Sidebar options for summarizing 
-    st.sidebar.title("Options")
-    
-    # Model selection
-    openAI_model = st.sidebar.selectbox("Choose the GPT Model", ("mini", "regular"))
-    model_to_use = "gpt-4o-mini" if openAI_model == "mini" else "gpt-4o"
-
-    # Summary options
-    summary_options = st.sidebar.radio(
-        "Select a format for summarizing the document:",
-        (
-            "Summarize the document in 100 words",
-            "Summarize the document in 2 connecting paragraphs",
-            "Summarize the document in 5 bullet points"
-        ),
+from conversation_memory import ConversationMemory
+from shared_resources import get_llm_gateway, get_summary_cache
+from summarizer import prepare_summary_messages
+from summary_cache import document_sha256
+
+# Prompt tokens spent on chat history; older turns are summarized
+HISTORY_TOKEN_BUDGET = 1500
+
+
+# Function to render the page (called by streamlit_app.py on every rerun)
+def render():
+    # Show title and description.
+    st.title("LAB-03-Karan Shah📄 Document question answering and Chatbot")
+    st.write(
+        "Upload a document below and ask a question about it – GPT will answer! "
+        "You can also interact with the chatbot. "
+        "To use this app, you need to provide an OpenAI API key, which you can get [here](https://platform.openai.com/account/api-keys). "
     )
 
-    if uploaded_file:
-        # Process the uploaded file
-        document = uploaded_file.read().decode()
-
-        # Instruction based on user selection on the sidebar menu
-        instruction = f"Summarize the document in {summary_options.lower()}."
-
-        # Prepare the messages for the LLM
-        messages = [
-            {
-                "role": "user",
-                "content": f"Here's a document: {document} \n\n---\n\n {instruction}",
-            }
-        ]
-
-        # Generate the summary using the OpenAI API
-        stream = client.chat.completions.create(
-            model=model_to_use,
-            messages=messages,
-            stream=True,
+    # Fetch the OpenAI API key from Streamlit secrets
+    openai_api_key = st.secrets["openai"]
+
+    if not openai_api_key:
+        st.info("Please add your OpenAI API key to continue.", icon="🗝")
+    else:
+        # Get the LLM gateway shared by all sessions
+        gateway = get_llm_gateway(openai_api_key)
+
+        # Let the user upload a file via st.file_uploader.
+        uploaded_file = st.file_uploader("Upload a document (.txt or .md)", type=("txt", "md"))
+
+        # Sidebar options for summarizing 
+        st.sidebar.title("Options")
+
+        # Model selection
+        openAI_model = st.sidebar.selectbox("Choose the GPT Model", ("mini", "regular"))
+        model_to_use = "gpt-4o-mini" if openAI_model == "mini" else "gpt-4o"
+
+        # Summary options
+        summary_options = st.sidebar.radio(
+            "Select a format for summarizing the document:",
+            (
+                "Summarize the document in 100 words",
+                "Summarize the document in 2 connecting paragraphs",
+                "Summarize the document in 5 bullet points"
+            ),
         )
 
-        # Stream the summary response to the app
-        st.write_stream(stream)
-
-    # Set up the session state to hold chatbot messages with a buffer limit
-    if "chat_history" not in st.session_state:
-        st.session_state["chat_history"] = [
-            {"role": "assistant", "content": "How can I help you?"}
-        ]
-
-    # Define the conversation buffer size (2 user messages and 2 responses)
-    conversation_buffer_size = 4  # 2 user messages + 2 assistant responses
-
-    def manage_conversation_buffer():
-        """Ensure the conversation buffer size does not exceed the limit."""
-        if len(st.session_state.chat_history) > conversation_buffer_size:
-            # Keep only the last conversation_buffer_size messages
-            st.session_state.chat_history = st.session_state.chat_history[-conversation_buffer_size:]
-
-    # Display the chatbot conversation
-    st.write("## Chatbot Interaction")
-    for msg in st.session_state.chat_history:
-        chat_msg = st.chat_message(msg["role"])
-        chat_msg.write(msg["content"])
-
-    # Get user input for the chatbot
-    if prompt := st.chat_input("Ask the chatbot a question or interact:"):
-        # Append the user input to the session state
-        st.session_state.chat_history.append({"role": "user", "content": prompt})
-
-        # Display the user input in the chat
-        with st.chat_message("user"):
-            st.markdown(prompt)
-
-        # Ensure the conversation buffer size does not exceed the limit
-        manage_conversation_buffer()
-
-        # Generate a response from OpenAI using the same model
-        stream = client.chat.completions.create(
-            model=model_to_use,
-            messages=st.session_state.chat_history,
-            stream=True,
-        )
-
-        # Stream the assistant's response
-        with st.chat_message("assistant"):
-            response = st.write_stream(stream)
-
-        # Append the assistant's response to the session state
-        st.session_state.chat_history.append({"role": "assistant", "content": response})
-
-        # Now, implement the logic to ask, "Do you want more info?"
-        if "yes" in prompt.lower():
-            follow_up_response = "Great! Here's more information: ..."
-        elif "no" in prompt.lower():
-            follow_up_response = "Okay! Feel free to ask anything else."
-
-        # If not yes/no, the assistant will ask, "Do you want more info?"
-        else:
-            follow_up_response = "Do you want more info?"
-
-        # Append the follow-up response to the session state and display
-        st.session_state.chat_history.append({"role": "assistant", "content": follow_up_response})
-        st.chat_message("assistant").write(follow_up_response)
-
-        # Ensure the conversation buffer size does not exceed the limit
-        manage_conversation_buffer()
+        if uploaded_file:
+            # Process the uploaded file
+            document_bytes = uploaded_file.getvalue()
+
+            # Instruction based on user selection on the sidebar menu
+            instruction = f"Summarize the document in {summary_options.lower()}."
+
+            # Reruns (e.g. every chat message) and repeat uploads replay the cached summary
+            summary_cache = get_summary_cache()
+            cache_key = (document_sha256(document_bytes), summary_options, model_to_use)
+            summary = summary_cache.get(*cache_key)
+            if summary is not None:
+                st.markdown(summary)
+            else:
+                document = document_bytes.decode()
+
+                # Prepare the messages for the LLM (long documents are condensed first, in parallel)
+                progress = st.empty()
+
+                def show_progress(done, total, stage):
+                    progress.progress(done / total, text=f"Condensing a long document ({stage}): {done}/{total}")
+
+                messages = prepare_summary_messages(
+                    gateway, model_to_use, document, instruction, on_progress=show_progress
+                )
+                progress.empty()
+
+                # Generate the summary using the OpenAI API (identical requests in flight are shared)
+                stream = gateway.stream_sync(model=model_to_use, messages=messages)
+
+                # Stream the summary response to the app, and cache it
+                summary_placeholder = st.empty()
+                summary = ""
+                for piece in stream:
+                    summary += piece
+                    summary_placeholder.markdown(summary + "▌")
+                summary_placeholder.markdown(summary)
+                summary_cache.put(*cache_key, summary)
+
+        # Set up the session state: the full transcript for display, and the
+        # token-budgeted memory that is actually sent to the model
+        if "chat_history" not in st.session_state:
+            st.session_state["chat_history"] = [
+                {"role": "assistant", "content": "How can I help you?"}
+            ]
+        if "conversation_memory" not in st.session_state:
+            st.session_state["conversation_memory"] = ConversationMemory(gateway, budget_tokens=HISTORY_TOKEN_BUDGET)
+        memory = st.session_state.conversation_memory
+
+        # Display the chatbot conversation
+        st.write("## Chatbot Interaction")
+        for msg in st.session_state.chat_history:
+            chat_msg = st.chat_message(msg["role"])
+            chat_msg.write(msg["content"])
+
+        # Get user input for the chatbot
+        if prompt := st.chat_input("Ask the chatbot a question or interact:"):
+            # Append the user input to the session state
+            st.session_state.chat_history.append({"role": "user", "content": prompt})
+            memory.add("user", prompt)
+
+            # Display the user input in the chat
+            with st.chat_message("user"):
+                st.markdown(prompt)
+
+            # Generate a response from OpenAI using the same model (recent turns + running summary)
+            stream = gateway.stream_sync(model=model_to_use, messages=memory.context_messages())
+
+            # Stream the assistant's response
+            with st.chat_message("assistant"):
+                response_placeholder = st.empty()
+                response = ""
+                for piece in stream:
+                    response += piece
+                    response_placeholder.markdown(response + "▌")
+                response_placeholder.markdown(response)
+
+            # Append the assistant's response to the session state
+            st.session_state.chat_history.append({"role": "assistant", "content": response})
+            memory.add("assistant", response)
+
+            # Now, implement the logic to ask, "Do you want more info?"
+            if "yes" in prompt.lower():
+                follow_up_response = "Great! Here's more information: ..."
+            elif "no" in prompt.lower():
+                follow_up_response = "Okay! Feel free to ask anything else."
+
+            # If not yes/no, the assistant will ask, "Do you want more info?"
+            else:
+                follow_up_response = "Do you want more info?"
+
+            # Append the follow-up response to the transcript and display it
+            # (it is canned text, so it is kept out of the model's context)
+            st.session_state.chat_history.append({"role": "assistant", "content": follow_up_response})
+            memory.add("assistant", follow_up_response, synthetic=True)
+            st.chat_message("assistant").write(follow_up_response)
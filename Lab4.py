@@ -1,195 +1,288 @@
 import streamlit as st
-from openai import OpenAI
 import os
-from PyPDF2 import PdfReader
-
+import time
+from context_builder import build_context
+from document_qa import (CHAT_MODEL, CODE_ONLY_QUERY_RE, CONTEXT_TOKEN_BUDGET, DENSE_TOP_K, EMBEDDING_MODEL,
+                         LEXICAL_INDEX_FILENAME, LEXICAL_TOP_K, RETRIEVAL_TOP_K, answer_messages, format_source)
+from embedding_engine import EmbeddingEngine
+from ingestion import MANIFEST_FILENAME
+from ingestion_worker import IngestionWorker
+from lexical_index import reciprocal_rank_fusion
+from query_cache import QueryEmbeddingCache
+from response_cache import SemanticResponseCache, replay_response
+from shared_resources import (CHROMA_DIRECTORY, get_collection, get_ingestion_worker, get_llm_gateway,
+                              get_openai_client)
+from tracing import count, get_recorder, observe, span, traced
+
+# BM25 index stored next to the ChromaDB files
+LEXICAL_INDEX_PATH = os.path.join(CHROMA_DIRECTORY, LEXICAL_INDEX_FILENAME)
+
+# Number of question embeddings kept in memory
+QUERY_CACHE_SIZE = 1024
+
+# How often (seconds) the page refreshes the indexing progress while the worker runs
+INDEXING_REFRESH_SECONDS = 2
+
+# Answers are reused for questions at least this similar, for this long (seconds)
+RESPONSE_CACHE_THRESHOLD = 0.95
+RESPONSE_CACHE_TTL = 3600
+RESPONSE_CACHE_SIZE = 512
+
+# Function to get the OpenAI client shared by all sessions
+def get_client():
+    # Get the API key from Streamlit secrets
+    return get_openai_client(st.secrets["openai"])
+
+# Function to get the LLM gateway shared by all sessions (chat completions go through it)
+def get_gateway():
+    return get_llm_gateway(st.secrets["openai"])
+
+# Function to get the ChromaDB collection and the background worker that keeps it in sync with the PDFs
+def create_lab4_collection():
+    collection = get_collection("Lab4Collection", CHROMA_DIRECTORY)
+
+    # Define the directory containing the PDF files
+    pdf_dir = os.path.join(os.getcwd(), "Lab4_datafiles")
+    if not os.path.exists(pdf_dir):
+        st.error(f"Directory not found: {pdf_dir}")
+        return None, None
+
+    # Embed only new or modified PDFs and drop deleted ones, in the background and once per
+    # process; PDFs dropped into the directory later are picked up without a restart
+    def create_worker():
+        return IngestionWorker(
+            collection,
+            EmbeddingEngine(get_client(), model=EMBEDDING_MODEL),
+            pdf_dir,
+            os.path.join(CHROMA_DIRECTORY, MANIFEST_FILENAME),
+            LEXICAL_INDEX_PATH,
+        )
 
-# Workaround for sqlite3 issue in Streamlit Cloud
-__import__('pysqlite3')
-import sys
-sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
+    return collection, get_ingestion_worker(collection, pdf_dir, create_worker)
 
-import chromadb
+# Function to get the query embedding cache shared by all sessions and reruns
+@st.cache_resource
+def get_query_embedding_cache():
+    sqlite_path = os.path.join(CHROMA_DIRECTORY, "query_embeddings.sqlite3")
+    return QueryEmbeddingCache(max_entries=QUERY_CACHE_SIZE, sqlite_path=sqlite_path)
 
+# Function to embed a question, reusing the embedding of a previously seen one
+def embed_query(query):
+    def compute(text):
+        current.set(cached=False)
+        response = get_client().embeddings.create(
+            input=text, model=EMBEDDING_MODEL
+        )
+        return response.data[0].embedding
 
-# Function to ensure the OpenAI client is initialized
-def ensure_openai_client():
-    if 'openai_client' not in st.session_state:
-        # Get the API key from Streamlit secrets
-        api_key = st.secrets["openai"]
-        # Initialize the OpenAI client and store it in session state
-        st.session_state.openai_client = OpenAI(api_key=api_key)
+    with span("lab4.embed_query", cached=True) as current:
+        embedding = get_query_embedding_cache().get_or_compute(EMBEDDING_MODEL, query, compute)
+    count("lab4.query_cache_hits" if current.attributes["cached"] else "lab4.query_cache_misses")
+    return embedding
 
-# Function to create the ChromaDB collection
-def create_lab4_collection():
-    if 'Lab4_vectorDB' not in st.session_state:
-        # Set up the ChromaDB client
-        persist_directory = os.path.join(os.getcwd(), "chroma_db")
-        client = chromadb.PersistentClient(path=persist_directory)
-        collection = client.get_or_create_collection("Lab4Collection")
-
-        ensure_openai_client()
-
-        # Define the directory containing the PDF files
-        pdf_dir = os.path.join(os.getcwd(), "Lab4_datafiles")
-        if not os.path.exists(pdf_dir):
-            st.error(f"Directory not found: {pdf_dir}")
-            return None
-
-        # Process each PDF file in the directory
-        for filename in os.listdir(pdf_dir):
-            if filename.endswith(".pdf"):
-                filepath = os.path.join(pdf_dir, filename)
-                try:
-                    # Extract text from the PDF
-                    with open(filepath, "rb") as file:
-                        pdf_reader = PdfReader(file)
-                        text = ''.join([page.extract_text() or '' for page in pdf_reader.pages])
-
-                    # Generate embeddings for the extracted text
-                    response = st.session_state.openai_client.embeddings.create(
-                        input=text, model="text-embedding-3-small"
-                    )
-                    embedding = response.data[0].embedding
-
-                    # Add the document to ChromaDB
-                    collection.add(
-                        documents=[text],
-                        metadatas=[{"filename": filename}],
-                        ids=[filename],
-                        embeddings=[embedding]
-                    )
-                except Exception as e:
-                    st.error(f"Error processing {filename}: {str(e)}")
-
-        # Store the collection in session state
-        st.session_state.Lab4_vectorDB = collection
-
-    return st.session_state.Lab4_vectorDB
-
-# Function to query the vector database
-def query_vector_db(collection, query):
-    ensure_openai_client()
+# Function to retrieve the most relevant chunks with BM25 and dense search fused by RRF
+@traced("lab4.query_vector_db")
+def query_vector_db(collection, query, lexical_index=None, n_results=RETRIEVAL_TOP_K,
+                    dense_k=DENSE_TOP_K, lexical_k=LEXICAL_TOP_K):
     try:
-        # Generate embedding for the query
-        response = st.session_state.openai_client.embeddings.create(
-            input=query, model="text-embedding-3-small"
+        passages = {}
+        rankings = []
+
+        # Lexical candidates (exact terms such as course codes)
+        if lexical_index is not None and lexical_k:
+            lexical_ranking = []
+            with span("lab4.lexical_search"):
+                hits = lexical_index.search(query, lexical_k)
+            for position, _ in hits:
+                chunk_id = lexical_index.ids[position]
+                passages[chunk_id] = (lexical_index.documents[position], lexical_index.metadatas[position])
+                lexical_ranking.append(chunk_id)
+            rankings.append(lexical_ranking)
+
+        # Dense candidates, unless the question is only course codes that BM25 already found
+        # (or nothing is indexed yet)
+        query_embedding = None
+        dense_k = min(dense_k, collection.count())
+        if dense_k and not (CODE_ONLY_QUERY_RE.match(query) and rankings and rankings[0]):
+            # Generate (or reuse) the embedding for the query
+            query_embedding = embed_query(query)
+
+            # Query the ChromaDB collection
+            with span("lab4.chroma_query", n_results=dense_k):
+                results = collection.query(
+                    query_embeddings=[query_embedding],
+                    n_results=dense_k
+                )
+            for chunk_id, document, metadata in zip(results['ids'][0], results['documents'][0], results['metadatas'][0]):
+                passages[chunk_id] = (document, metadata)
+            rankings.append(results['ids'][0])
+
+        ids = reciprocal_rank_fusion(rankings)[:n_results]
+        return (
+            [passages[chunk_id][0] for chunk_id in ids],
+            [format_source(passages[chunk_id][1]) for chunk_id in ids],
+            ids,
+            query_embedding,
         )
-        query_embedding = response.data[0].embedding
-
-        # Query the ChromaDB collection
-        results = collection.query(
-            query_embeddings=[query_embedding],
-            n_results=3
-        )
-        return results['documents'][0], [result['filename'] for result in results['metadatas'][0]]
     except Exception as e:
         st.error(f"Error querying the database: {str(e)}")
-        return [], []
+        return [], [], [], None
 
-# Function to get chatbot response using OpenAI's GPT model
+# Function to stream the chatbot's answer (text pieces) through the shared LLM gateway
 def get_chatbot_response(query, context):
-    ensure_openai_client()
-    # Construct the prompt for the GPT model
-    prompt = f"""You are an AI assistant with knowledge from specific documents. Use the following context to answer the user's question. If the information is not in the context, say you don't know based on the available information.
-
-Context:
-{context}
-
-User Question: {query}
-
-Answer:"""
-
     try:
-        # Generate streaming response using OpenAI's chat completion
-        response_stream = st.session_state.openai_client.chat.completions.create(
-            model="gpt-4o",  # Using the latest GPT-4 model
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant."},
-                {"role": "user", "content": prompt}
-            ],
-            stream=True  # Enable streaming
-        )
-        return response_stream
+        # Identical questions over the same context that are in flight share one request
+        yield from get_gateway().stream_sync(model=CHAT_MODEL, messages=answer_messages(query, context))
     except Exception as e:
         st.error(f"Error getting chatbot response: {str(e)}")
-        return None
-
-# Initialize session state for chat history, system readiness, and collection
-if 'chat_history' not in st.session_state:
-    st.session_state.chat_history = []
-if 'system_ready' not in st.session_state:
-    st.session_state.system_ready = False
-if 'collection' not in st.session_state:
-    st.session_state.collection = None
-
-# Page content
-st.title("Lab 4 - Document Chatbot")
-
-# Check if the system is ready, if not, prepare it
-if not st.session_state.system_ready:
-    # Show a spinner while processing documents
-    with st.spinner("Processing documents and preparing the system..."):
-        st.session_state.collection = create_lab4_collection()
-        if st.session_state.collection:
-            # Set the system as ready and show a success message
-            st.session_state.system_ready = True
-            st.success("AI ChatBot is Ready!!!")
-        else:
-            st.error("Failed to create or load the document collection. Please check the file path and try again.")
-
-# Only show the chat interface if the system is ready
-if st.session_state.system_ready and st.session_state.collection:
-    st.subheader("Chat with the AI Assistant")
-
-    # Display chat history
-    for message in st.session_state.chat_history:
-        if isinstance(message, dict):
-            # New format (dictionary with 'role' and 'content' keys)
-            with st.chat_message(message["role"]):
-                st.markdown(message["content"])
-        elif isinstance(message, tuple):
-            # Old format (tuple with role and content)
-            role, content = message
-            # Convert 'You' to 'user', and assume any other role is 'assistant'
-            with st.chat_message("user" if role == "You" else "assistant"):
-                st.markdown(content)
-
-    # User input
-    user_input = st.chat_input("Ask a question about the documents:")
-
-    if user_input:
-        # Display user message
-        with st.chat_message("user"):
-            st.markdown(user_input)
-
-        # Query the vector database
-        relevant_texts, relevant_docs = query_vector_db(st.session_state.collection, user_input)
-        context = "\n".join(relevant_texts)
-
-        # Get streaming chatbot response
-        response_stream = get_chatbot_response(user_input, context)
-
-        # Display AI response
-        with st.chat_message("assistant"):
-            response_placeholder = st.empty()
-            full_response = ""
-            for chunk in response_stream:
-                if chunk.choices[0].delta.content is not None:
-                    full_response += chunk.choices[0].delta.content
-                    response_placeholder.markdown(full_response + "▌")
-            response_placeholder.markdown(full_response)
 
-        # Add to chat history (new format)
-        st.session_state.chat_history.append({"role": "user", "content": user_input})
-        st.session_state.chat_history.append({"role": "assistant", "content": full_response})
-
-        # Display relevant documents
-        with st.expander("Relevant documents used"):
-            for doc in relevant_docs:
-                st.write(f"- {doc}")
+# Function to get the answer cache shared by all sessions and reruns
+@st.cache_resource
+def get_response_cache():
+    return SemanticResponseCache(
+        threshold=RESPONSE_CACHE_THRESHOLD, ttl=RESPONSE_CACHE_TTL, max_entries=RESPONSE_CACHE_SIZE
+    )
+
+# Function to render the page (called by streamlit_app.py on every rerun)
+def render():
+    # Initialize session state for chat history (everything else is shared by the process)
+    if 'chat_history' not in st.session_state:
+        st.session_state.chat_history = []
+
+    # Page content
+    st.title("Lab 4 - Document Chatbot")
+
+    # Get the shared collection; documents are indexed in the background while the chat is usable
+    collection, ingestion_worker = create_lab4_collection()
+
+    # Only show the chat interface if the collection is available
+    if collection is not None:
+        ingestion_status = ingestion_worker.status()
+        indexing = ingestion_status["state"] in ("starting", "queued", "indexing")
+        if indexing:
+            indexed_passages = collection.count()
+            if ingestion_status["total"]:
+                st.progress(
+                    ingestion_status["done"] / ingestion_status["total"],
+                    text=f"Indexing documents in the background: {ingestion_status['done']}/"
+                         f"{ingestion_status['total']} files, {indexed_passages} passages searchable so far",
+                )
+            else:
+                st.caption(f"Checking the documents for changes ({indexed_passages} passages searchable)...")
+
+        if ingestion_status["errors"]:
+            with st.expander(f"{len(ingestion_status['errors'])} document(s) could not be indexed"):
+                for error in ingestion_status["errors"]:
+                    st.write(error)
+
+        st.subheader("Chat with the AI Assistant")
+
+        # Display chat history
+        for message in st.session_state.chat_history:
+            if isinstance(message, dict):
+                # New format (dictionary with 'role' and 'content' keys)
+                with st.chat_message(message["role"]):
+                    st.markdown(message["content"])
+            elif isinstance(message, tuple):
+                # Old format (tuple with role and content)
+                role, content = message
+                # Convert 'You' to 'user', and assume any other role is 'assistant'
+                with st.chat_message("user" if role == "You" else "assistant"):
+                    st.markdown(content)
+
+        # User input
+        user_input = st.chat_input("Ask a question about the documents:")
+
+        if user_input:
+            # Display user message
+            with st.chat_message("user"):
+                st.markdown(user_input)
+
+            # Query the vector database (whatever is indexed so far)
+            relevant_texts, relevant_docs, relevant_ids, query_embedding = query_vector_db(
+                collection, user_input, ingestion_worker.lexical_index()
+            )
+            with span("lab4.build_context") as current:
+                context, context_ids, context_tokens = build_context(
+                    list(zip(relevant_ids, relevant_texts)), CONTEXT_TOKEN_BUDGET
+                )
+                current.set(tokens=context_tokens, passages=len(context_ids))
+            count("lab4.context_tokens", context_tokens)
+
+            # Reuse the answer to an equivalent question over the same passages (ids and text), if any
+            relevant_by_id = dict(zip(relevant_ids, relevant_texts))
+            context_passages = [(chunk_id, relevant_by_id[chunk_id]) for chunk_id in context_ids]
+            cached_response = None
+            if query_embedding is not None:
+                cached_response = get_response_cache().lookup(query_embedding, context_passages, CHAT_MODEL)
+
+            count("lab4.response_cache_hits" if cached_response is not None else "lab4.response_cache_misses")
+            if cached_response is not None:
+                response_text = replay_response(cached_response)
+            else:
+                # Get streaming chatbot response
+                response_text = get_chatbot_response(user_input, context)
+
+            # Display AI response
+            with st.chat_message("assistant"):
+                response_placeholder = st.empty()
+                full_response = ""
+                started = time.perf_counter()
+                first_piece_at, pieces = None, 0
+                for piece in response_text:
+                    if first_piece_at is None:
+                        first_piece_at = time.perf_counter()
+                    pieces += 1
+                    full_response += piece
+                    response_placeholder.markdown(full_response + "▌")
+                response_placeholder.markdown(full_response)
+                finished = time.perf_counter()
+
+            if first_piece_at is not None:
+                cached = cached_response is not None
+                observe("lab4.time_to_first_token", first_piece_at - started, cached=cached)
+                observe("lab4.stream", finished - started, cached=cached, pieces=pieces)
+                count("lab4.streamed_pieces", pieces)
+
+            if cached_response is None and query_embedding is not None and full_response:
+                get_response_cache().store(query_embedding, context_passages, CHAT_MODEL, full_response)
+
+            # Add to chat history (new format)
+            st.session_state.chat_history.append({"role": "user", "content": user_input})
+            st.session_state.chat_history.append({"role": "assistant", "content": full_response})
+
+            # Display relevant documents
+            with st.expander("Relevant documents used"):
+                used_ids = set(context_ids)
+                for doc in dict.fromkeys(source for chunk_id, source in zip(relevant_ids, relevant_docs) if chunk_id in used_ids):
+                    st.write(f"- {doc}")
+                st.caption(f"Context: {context_tokens} tokens from {len(context_ids)} passages")
+
+        # Show how often question embeddings were served from the cache
+        cache_stats = get_query_embedding_cache().stats()
+        st.sidebar.caption(
+            f"Query embedding cache: {cache_stats['hits'] + cache_stats['disk_hits']} hits "
+            f"({cache_stats['disk_hits']} from disk), {cache_stats['misses']} misses"
+        )
+        response_stats = get_response_cache().stats()
+        st.sidebar.caption(
+            f"Answer cache: {response_stats['hits']} hits, {response_stats['misses']} misses"
+        )
 
-elif not st.session_state.system_ready:
-    st.info("The system is still preparing. Please wait...")
-else:
-    st.error("Failed to create or load the document collection. Please check the file path and try again.")
+        # Optional admin panel with the per-stage timings of this process
+        if st.sidebar.checkbox("Show pipeline timings"):
+            spans, counters = get_recorder().summary()
+            st.sidebar.dataframe(
+                [{"stage": name, **{key: round(value, 1) for key, value in stats.items()}}
+                 for name, stats in sorted(spans.items())],
+                hide_index=True,
+            )
+            st.sidebar.json({name: round(value, 1) for name, value in sorted(counters.items())})
+
+        # Keep the progress current until the background indexing is done
+        if indexing:
+            time.sleep(INDEXING_REFRESH_SECONDS)
+            st.rerun()
+
+    else:
+        st.error("Failed to create or load the document collection. Please check the file path and try again.")
@@ -1,56 +1,97 @@
+import asyncio
+import json
+
 import streamlit as st
-from openai import OpenAI
-import requests
-
-# Set API Keys from Streamlit secrets
-client = OpenAI(api_key=st.secrets["openai"])
-
-weather_api_key = st.secrets["weather"]  # Accessing OpenWeatherMap API key from Streamlit secrets
-
-
-def get_weather(location="Syracuse, NY"):
-    """Fetch weather data from OpenWeatherMap."""
-    url = f"http://api.openweathermap.org/data/2.5/weather?q={location}&appid={weather_api_key}&units=metric"
-    response = requests.get(url)
-    if response.status_code == 200:
-        data = response.json()
-        return {
-            "location": data["name"],
-            "temperature": round(data["main"]["temp"], 2),
-            "feels_like": round(data["main"]["feels_like"], 2),
-            "temp_min": round(data["main"]["temp_min"], 2),
-            "temp_max": round(data["main"]["temp_max"], 2),
-            "humidity": round(data["main"]["humidity"], 2),
-            "weather": data["weather"][0]["description"]
-        }
-    else:
-        return {"error": "Could not retrieve weather data."}
-
-def get_clothing_suggestions(weather_info):
-    """Function to call OpenAI's API for clothing suggestions based on the weather."""
-    prompt = (f"The current weather in {weather_info['location']} is {weather_info['temperature']}°C, "
-              f"with a 'feels like' temperature of {weather_info['feels_like']}°C. "
-              f"The humidity is {weather_info['humidity']}%. "
-              f"Based on this, what kind of clothing would you suggest for someone traveling today?")
-
-    response = client.chat.completions.create(
-        model="gpt-3.5-turbo",  # Specify model as per new API
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant that gives weather-based clothing advice in one line. Provide clothing suggestions and advice on whether it’s a good day for a picnic."},
-            {"role": "user", "content": prompt}
-        ],
-        max_tokens=100
+from async_bridge import iter_async
+from shared_resources import get_llm_gateway, get_weather_client
+from tracing import traced
+from weather_client import normalize_location
+
+# Default location when the user leaves the city blank
+DEFAULT_LOCATION = "Syracuse, NY"
+
+# Model and instructions used for clothing advice
+CLOTHING_MODEL = "gpt-3.5-turbo"
+CLOTHING_SYSTEM_PROMPT = (
+    "You are a helpful assistant that gives weather-based clothing advice in one line per city. "
+    "Provide clothing suggestions and advice on whether it’s a good day for a picnic. "
+    "Use the get_weather tool to look up the current weather of every city you are asked about."
+)
+
+# get_weather exposed to the model as a function-calling tool
+WEATHER_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "get_weather",
+        "description": "Get the current weather for a city.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "location": {"type": "string", "description": "City and optionally state/country, e.g. Syracuse, NY"},
+            },
+            "required": ["location"],
+        },
+    },
+}
+
+
+@traced("lab5.get_weather")
+def get_weather(location=DEFAULT_LOCATION):
+    """Fetch weather data from OpenWeatherMap (cached for a few minutes per location)."""
+    weather_api_key = st.secrets["weather"]  # Accessing OpenWeatherMap API key from Streamlit secrets
+    return get_weather_client(weather_api_key).get(location or DEFAULT_LOCATION)
+
+async def run_weather_tool(tool_call, weather_client, prefetched):
+    """Run one get_weather tool call, reusing a weather lookup already in flight."""
+    try:
+        location = json.loads(tool_call.function.arguments or "{}").get("location") or DEFAULT_LOCATION
+    except ValueError:
+        location = DEFAULT_LOCATION
+    task = prefetched.get(normalize_location(location))
+    if task is None:
+        task = asyncio.ensure_future(asyncio.to_thread(weather_client.get, location))
+    return {"role": "tool", "tool_call_id": tool_call.id, "content": json.dumps(await task)}
+
+async def stream_clothing_advice(cities, gateway, weather_client):
+    """Async generator streaming clothing advice for one or more cities.
+
+    The weather of every city the user typed is fetched concurrently while
+    the model decides which get_weather tool calls to make, so the tool
+    results are usually ready by the time the calls arrive; the calls then
+    run concurrently and the final advice is streamed as it is generated.
+    """
+    prefetched = {
+        normalize_location(city): asyncio.ensure_future(asyncio.to_thread(weather_client.get, city))
+        for city in cities
+    }
+    messages = [
+        {"role": "system", "content": CLOTHING_SYSTEM_PROMPT},
+        {"role": "user", "content": f"What should I wear today in {'; '.join(cities)}?"},
+    ]
+
+    first = await gateway.create(
+        model=CLOTHING_MODEL, messages=messages, tools=[WEATHER_TOOL], tool_choice="auto",
     )
-    # Extract the text from the completion response
-    return response.choices[0].message.content.strip()
+    message = first.choices[0].message
+    if message.tool_calls:
+        messages.append({
+            "role": "assistant",
+            "content": message.content,
+            "tool_calls": [call.model_dump() for call in message.tool_calls],
+        })
+        messages.extend(await asyncio.gather(
+            *(run_weather_tool(call, weather_client, prefetched) for call in message.tool_calls)
+        ))
+    elif message.content:
+        # The model answered without tools
+        yield message.content
+        return
 
-def llm_tool(location):
-    """Function to get weather details."""
-    if not location:
-        location = "Syracuse, NY"  # Default location
-    
-    weather_data = get_weather(location)
-    
+    async for piece in gateway.stream(model=CLOTHING_MODEL, messages=messages, max_tokens=100 * len(cities)):
+        yield piece
+
+def format_weather(weather_data):
+    """Function to format weather details for display."""
     if 'error' in weather_data:
         return f"Error: {weather_data['error']}"
     
@@ -62,26 +103,45 @@ def llm_tool(location):
             f"Humidity: {weather_data['humidity']}%\n"
             f"Conditions: {weather_data['weather']}")
 
-# Streamlit UI
-st.title("Weather and Clothing Suggestion Bot")
-
-# Get user input for location
-user_input = st.text_input("Enter a city (leave blank for default - Syracuse, NY):")
-
-# Create two buttons side by side
-col1, col2 = st.columns(2)
-
-with col1:
-    if st.button("Get Weather Suggestion", key="key1"):
-        suggestion = llm_tool(user_input)
-        st.write(suggestion)
-
-with col2:
-    if st.button("Get Clothing Suggestion", key="key2"):
-        weather_data = get_weather(user_input)
-        if 'error' not in weather_data:
-            clothing_suggestion = get_clothing_suggestions(weather_data)
-            st.write(f"Weather Info:\n{llm_tool(user_input)}")
-            st.write(f"\nClothing Suggestion: {clothing_suggestion}")
-        else:
-            st.write(f"Error: {weather_data['error']}")
+def split_cities(user_input):
+    """Function to split the input into cities (separated by ';'), defaulting to Syracuse."""
+    return [city.strip() for city in user_input.split(";") if city.strip()] or [DEFAULT_LOCATION]
+
+def llm_tool(location):
+    """Function to get weather details (of every city, when several are separated by ';')."""
+    return "\n\n".join(format_weather(get_weather(city)) for city in split_cities(location or ""))
+
+# Function to render the page (called by streamlit_app.py on every rerun)
+def render():
+    # Streamlit UI
+    st.title("Weather and Clothing Suggestion Bot")
+
+    # Get user input for location
+    user_input = st.text_input("Enter a city, or several separated by ';' (leave blank for default - Syracuse, NY):")
+
+    # Create two buttons side by side
+    col1, col2 = st.columns(2)
+
+    with col1:
+        if st.button("Get Weather Suggestion", key="key1"):
+            suggestion = llm_tool(user_input)
+            st.write(suggestion)
+
+    with col2:
+        if st.button("Get Clothing Suggestion", key="key2"):
+            # Several cities can be requested at once, separated by ";"
+            cities = split_cities(user_input)
+            weather_client = get_weather_client(st.secrets["weather"])
+            advice = stream_clothing_advice(
+                cities, get_llm_gateway(st.secrets["openai"]), weather_client
+            )
+            st.write("Clothing Suggestion:")
+            advice_placeholder = st.empty()
+            full_advice = ""
+            for piece in iter_async(advice):
+                full_advice += piece
+                advice_placeholder.markdown(full_advice + "▌")
+            advice_placeholder.markdown(full_advice)
+            # Already in the weather cache, so this does not call the API again
+            for city in cities:
+                st.write(f"Weather Info:\n{format_weather(weather_client.get(city))}")
@@ -0,0 +1,116 @@
+import datetime
+
+import streamlit as st
+from news_embeddings import EMBEDDINGS_DIR, NewsVectorIndex
+from news_store import EPOCH, NEWS_CSV_PATH, NewsStore
+from shared_resources import get_llm_gateway, get_openai_client
+
+# Chat model used to answer questions about the news
+CHAT_MODEL = "gpt-4o-mini"
+
+# Must match the model the news embedding matrix was built with
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Option meaning "no company filter"
+ALL_COMPANIES = "All companies"
+
+
+# Function to get the news store, loaded once per process
+@st.cache_resource
+def get_news_store():
+    return NewsStore.from_csv(NEWS_CSV_PATH)
+
+
+# Function to get the memory-mapped news embeddings (None until news_embeddings.py was run)
+@st.cache_resource
+def get_news_vector_index():
+    try:
+        return NewsVectorIndex.open(EMBEDDINGS_DIR)
+    except FileNotFoundError:
+        return None
+
+
+# Function to find the stories closest in meaning to a question, within the filters
+def semantic_top_stories(store, index, question, company, start, end, n):
+    response = get_openai_client(st.secrets["openai"]).embeddings.create(input=question, model=EMBEDDING_MODEL)
+    candidates = store.row_ids[store.select(company, start, end)]
+    row_ids, _ = index.search(response.data[0].embedding, n, rows=candidates)
+    return store.positions_of(row_ids)
+
+
+# Function to format stories as prompt context
+def format_stories(store, positions):
+    lines = []
+    for position in positions:
+        story = store.story(position)
+        lines.append(f"- [{story['Date'][:10]}] {story['company_name']}: {story['Document']} ({story['URL']})")
+    return "\n".join(lines)
+
+
+# Function to render the page (called by streamlit_app.py on every rerun)
+def render():
+    st.title("Lab 6 - News Chatbot")
+
+    store = get_news_store()
+    if "news_chat_history" not in st.session_state:
+        st.session_state.news_chat_history = []
+
+    # Sidebar filters
+    st.sidebar.header("News Filters")
+    company = st.sidebar.selectbox("Company", [ALL_COMPANIES] + store.companies)
+    first_day = EPOCH + datetime.timedelta(days=int(store.days.min()))
+    last_day = EPOCH + datetime.timedelta(days=int(store.days.max()))
+    date_range = st.sidebar.date_input(
+        "Date range", (first_day, last_day), min_value=first_day, max_value=last_day
+    )
+    top_n = st.sidebar.slider("Stories per answer", 3, 20, 8)
+
+    # The date input returns a single date while the user is still picking the range
+    start, end = (date_range[0], date_range[-1]) if isinstance(date_range, tuple) else (date_range, date_range)
+    company = None if company == ALL_COMPANIES else company
+
+    # Show the most recent stories for the current filters
+    with st.expander("Most recent stories"):
+        for position in store.top_stories(company, start, end, n=top_n):
+            story = store.story(position)
+            st.markdown(f"**{story['Date'][:10]} · {story['company_name']}** — [{story['Document']}]({story['URL']})")
+
+    # Display chat history
+    for message in st.session_state.news_chat_history:
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
+
+    if question := st.chat_input("Ask about the news:"):
+        with st.chat_message("user"):
+            st.markdown(question)
+
+        # Relevant stories first (by meaning when the embeddings are built); fall back to the most recent ones
+        index = get_news_vector_index()
+        if index is not None:
+            positions = semantic_top_stories(store, index, question, company, start, end, top_n)
+        else:
+            positions = store.top_stories(company, start, end, n=top_n, query=question)
+        if len(positions) == 0:
+            positions = store.top_stories(company, start, end, n=top_n)
+
+        messages = [
+            {"role": "system", "content": "You are a helpful assistant that answers questions about company news. "
+                                          "Only use the stories provided and cite their dates."},
+            {"role": "user", "content": f"News stories:\n{format_stories(store, positions)}\n\nQuestion: {question}"},
+        ]
+        stream = get_llm_gateway(st.secrets["openai"]).stream_sync(model=CHAT_MODEL, messages=messages)
+        with st.chat_message("assistant"):
+            response_placeholder = st.empty()
+            response = ""
+            for piece in stream:
+                response += piece
+                response_placeholder.markdown(response + "▌")
+            response_placeholder.markdown(response)
+
+        st.session_state.news_chat_history.append({"role": "user", "content": question})
+        st.session_state.news_chat_history.append({"role": "assistant", "content": response})
+
+        with st.expander("Stories used"):
+            for position in positions:
+                story = store.story(position)
+                st.write(f"- {story['Date'][:10]} {story['company_name']}: {story['URL']}")
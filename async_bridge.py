@@ -0,0 +1,46 @@
+"""Run asyncio code from Streamlit's synchronous script threads.
+
+One event loop runs forever in a daemon thread of the process. Async
+clients (and their connection pools) live on that loop and are shared by
+every session; script threads hand coroutines to it and wait for the result.
+"""
+import asyncio
+import threading
+
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+# Function to get the process-wide event loop, starting its thread on first use
+def get_event_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="async-bridge", daemon=True).start()
+            _loop = loop
+        return _loop
+
+
+# Function to run a coroutine on the shared loop and wait for its result
+def run_async(coroutine, timeout=None):
+    return asyncio.run_coroutine_threadsafe(coroutine, get_event_loop()).result(timeout)
+
+
+def iter_async(async_iterator):
+    """Iterate an async iterator from synchronous code, one item at a time.
+
+    If the caller stops early, the async iterator is closed on the loop.
+    """
+    loop = get_event_loop()
+    try:
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(async_iterator.__anext__(), loop).result()
+            except StopAsyncIteration:
+                return
+    finally:
+        close = getattr(async_iterator, "aclose", None)
+        if close is not None:
+            asyncio.run_coroutine_threadsafe(close(), loop).result()
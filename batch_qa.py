@@ -0,0 +1,216 @@
+"""Answer a file of questions about a set of PDFs, without the Streamlit UI.
+
+    $ OPENAI_API_KEY=... python batch_qa.py questions.txt --out answers.jsonl
+    $ DOCQA_BACKEND=stub python batch_qa.py questions.jsonl --concurrency 32 --rpm 3000
+
+Questions are read from a .txt file (one per line) or a .jsonl file (one
+object per line with a "question" and an optional "id"). The PDFs are
+indexed exactly like the Lab4 page does (same collection, manifest and BM25
+index under --index-dir, so both share one index), all questions are
+embedded in a few batched requests, retrieval runs on batched Chroma
+queries, and the answers are generated concurrently through the LLM
+gateway (llm_gateway.py), whose concurrency cap and requests per minute
+pace default to DOCQA_LLM_MAX_CONCURRENCY and DOCQA_LLM_REQUESTS_PER_MINUTE
+and can be overridden with --concurrency and --rpm. One JSON line per
+question is written as soon as its answer is ready; lines carry the
+question's "index" in the input file.
+
+The same steps are available to Python code through `load_questions`,
+`build_index` and `answer_questions`.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from context_builder import build_context
+from document_qa import (CHAT_MODEL, CODE_ONLY_QUERY_RE, CONTEXT_TOKEN_BUDGET, DENSE_TOP_K, EMBEDDING_MODEL,
+                         LEXICAL_INDEX_FILENAME, LEXICAL_TOP_K, RETRIEVAL_TOP_K, answer_messages, format_source)
+from embedding_engine import EmbeddingEngine
+from ingestion import MANIFEST_FILENAME, sync_collection
+from lexical_index import BM25Index, build_from_collection, reciprocal_rank_fusion
+from llm_gateway import LLMGateway
+from shared_resources import (BACKEND, CHROMA_DIRECTORY, LLM_MAX_CONCURRENCY, LLM_REQUESTS_PER_MINUTE,
+                              get_async_openai_client, get_collection, get_openai_client)
+from tracing import span
+
+
+# Questions per batched Chroma query
+QUERY_BATCH_SIZE = 256
+
+
+# Function to read questions from a .txt (one per line) or .jsonl file; returns (id, question) pairs
+def load_questions(path):
+    questions = []
+    with open(path, "r", encoding="utf-8") as file:
+        for number, line in enumerate(file, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            if path.endswith(".jsonl"):
+                record = json.loads(line)
+                questions.append((record.get("id", number), record["question"]))
+            else:
+                questions.append((number, line))
+    return questions
+
+
+def build_index(client, pdf_dir, index_dir=CHROMA_DIRECTORY, on_error=None):
+    """Bring the Lab4 collection under `index_dir` in line with `pdf_dir`.
+
+    Returns (collection, lexical_index, sync result). Only new or modified
+    PDFs are embedded, so re-running on the same documents is cheap.
+    """
+    collection = get_collection("Lab4Collection", index_dir)
+    lexical_index_path = os.path.join(index_dir, LEXICAL_INDEX_FILENAME)
+    result = sync_collection(
+        collection,
+        EmbeddingEngine(client, model=EMBEDDING_MODEL),
+        pdf_dir,
+        os.path.join(index_dir, MANIFEST_FILENAME),
+        on_error=on_error,
+    )
+    if result["indexed"] or result["removed"] or not os.path.exists(lexical_index_path):
+        lexical_index = build_from_collection(collection, lexical_index_path)
+    else:
+        lexical_index = BM25Index.load(lexical_index_path)
+    return collection, lexical_index, result
+
+
+# Function to retrieve passages for many questions with batched Chroma queries
+def retrieve_all(collection, lexical_index, questions, embeddings, n_results=RETRIEVAL_TOP_K,
+                 dense_k=DENSE_TOP_K, lexical_k=LEXICAL_TOP_K):
+    dense_k = min(dense_k, collection.count())
+    dense = [None] * len(questions)
+    if dense_k:
+        for start in range(0, len(questions), QUERY_BATCH_SIZE):
+            with span("batch_qa.chroma_query", questions=len(embeddings[start:start + QUERY_BATCH_SIZE])):
+                results = collection.query(
+                    query_embeddings=embeddings[start:start + QUERY_BATCH_SIZE], n_results=dense_k
+                )
+            for offset, ids in enumerate(results["ids"]):
+                dense[start + offset] = list(zip(ids, results["documents"][offset], results["metadatas"][offset]))
+
+    retrieved = []
+    for question, dense_hits in zip(questions, dense):
+        passages, rankings = {}, []
+        if lexical_index is not None and lexical_k:
+            lexical_ranking = []
+            for position, _ in lexical_index.search(question, lexical_k):
+                chunk_id = lexical_index.ids[position]
+                passages[chunk_id] = (lexical_index.documents[position], lexical_index.metadatas[position])
+                lexical_ranking.append(chunk_id)
+            rankings.append(lexical_ranking)
+        # Like Lab4: questions that are only course codes rely on BM25 when it found something
+        if dense_hits and not (CODE_ONLY_QUERY_RE.match(question) and rankings and rankings[0]):
+            for chunk_id, document, metadata in dense_hits:
+                passages[chunk_id] = (document, metadata)
+            rankings.append([chunk_id for chunk_id, _, _ in dense_hits])
+        ids = reciprocal_rank_fusion(rankings)[:n_results]
+        retrieved.append([(chunk_id, passages[chunk_id][0], passages[chunk_id][1]) for chunk_id in ids])
+    return retrieved
+
+
+def answer_questions(client, gateway, questions, collection, lexical_index, chat_model=CHAT_MODEL, on_answer=None):
+    """Answer (id, question) pairs from the indexed documents.
+
+    Questions are embedded with `client`; completions go through `gateway`
+    (an LLMGateway), up to its `max_concurrency` at a time. Returns one
+    dict per question, in input order, with the answer, its sources and
+    chunk ids, the context size, the latency of the completion and an
+    "error" (None on success). `on_answer(result)` is called as each answer
+    completes, from the calling thread.
+    """
+    texts = [question for _, question in questions]
+    with span("batch_qa.embed_questions", questions=len(texts)):
+        embeddings = EmbeddingEngine(client, model=EMBEDDING_MODEL).embed(texts)
+    with span("batch_qa.retrieve", questions=len(texts)):
+        retrieved = retrieve_all(collection, lexical_index, texts, embeddings)
+
+    def answer(index):
+        question_id, question = questions[index]
+        passages = retrieved[index]
+        context, context_ids, context_tokens = build_context(
+            [(chunk_id, text) for chunk_id, text, _ in passages], CONTEXT_TOKEN_BUDGET
+        )
+        sources = {chunk_id: format_source(metadata) for chunk_id, _, metadata in passages}
+        result = {
+            "index": index,
+            "id": question_id,
+            "question": question,
+            "answer": None,
+            "sources": list(dict.fromkeys(sources[chunk_id] for chunk_id in context_ids)),
+            "chunk_ids": context_ids,
+            "context_tokens": context_tokens,
+            "latency_ms": None,
+            "error": None,
+        }
+        started = time.perf_counter()
+        try:
+            with span("batch_qa.completion", model=chat_model):
+                result["answer"] = gateway.complete_sync(model=chat_model, messages=answer_messages(question, context))
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+        result["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return result
+
+    results = [None] * len(questions)
+    with ThreadPoolExecutor(max_workers=gateway.max_concurrency) as executor:
+        for future in as_completed([executor.submit(answer, index) for index in range(len(questions))]):
+            result = future.result()
+            results[result["index"]] = result
+            if on_answer is not None:
+                on_answer(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("questions", help=".txt (one question per line) or .jsonl file")
+    parser.add_argument("--docs", default=os.path.join(os.getcwd(), "Lab4_datafiles"), help="directory of PDFs")
+    parser.add_argument("--index-dir", default=CHROMA_DIRECTORY,
+                        help="where the collection, manifest and BM25 index live (one per document set)")
+    parser.add_argument("--out", default="answers.jsonl")
+    parser.add_argument("--model", default=CHAT_MODEL)
+    parser.add_argument("--concurrency", type=int, default=LLM_MAX_CONCURRENCY, help="completions in flight at once")
+    parser.add_argument("--rpm", type=int, default=LLM_REQUESTS_PER_MINUTE, help="completion requests per minute")
+    args = parser.parse_args()
+
+    api_key = os.environ.get("OPENAI_API_KEY") or ("stub" if BACKEND == "stub" else None)
+    if not api_key:
+        parser.error("set OPENAI_API_KEY (or DOCQA_BACKEND=stub)")
+    client = get_openai_client(api_key)
+    gateway = LLMGateway(get_async_openai_client(api_key), max_concurrency=args.concurrency,
+                         requests_per_minute=args.rpm)
+
+    questions = load_questions(args.questions)
+    started = time.perf_counter()
+    collection, lexical_index, result = build_index(
+        client, args.docs, args.index_dir,
+        on_error=lambda filename, e: print(f"Error processing {filename}: {e}", file=sys.stderr),
+    )
+    print(f"Index: {len(result['indexed'])} indexed, {len(result['skipped'])} unchanged, "
+          f"{len(result['removed'])} removed, {collection.count()} chunks ({time.perf_counter() - started:.1f}s)")
+
+    started = time.perf_counter()
+    answered, failed = 0, 0
+    with open(args.out, "w", encoding="utf-8") as out:
+        def write(answer):
+            nonlocal answered, failed
+            out.write(json.dumps(answer, ensure_ascii=False) + "\n")
+            answered += 1
+            failed += answer["error"] is not None
+            if answered % 100 == 0:
+                print(f"{answered}/{len(questions)} answered", file=sys.stderr)
+
+        answer_questions(client, gateway, questions, collection, lexical_index, args.model, on_answer=write)
+
+    elapsed = time.perf_counter() - started
+    print(f"{answered} answers ({failed} failed) written to {args.out} in {elapsed:.1f}s "
+          f"({answered / elapsed if elapsed else 0:.1f} questions/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Benchmark NewsStore queries against a naive pandas filter.
+
+    $ python -m benchmarks.news_store_bench --scale 1000 --queries 200
+
+`--scale` replicates the CSV rows (shifting their dates) to simulate a
+bigger feed.
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+import pandas as pd
+
+from news_store import NEWS_CSV_PATH, NewsStore, normalize_company
+
+
+# Function to build a bigger frame by replicating the CSV with shifted dates
+def scaled_frame(path, scale):
+    frame = pd.read_csv(path)
+    frame["company_name"] = frame["company_name"].map(normalize_company)
+    if scale <= 1:
+        return frame
+    copies = []
+    for copy in range(scale):
+        shifted = frame.copy()
+        shifted["days_since_2000"] = shifted["days_since_2000"] - 8 * copy
+        shifted["Date"] = (pd.to_datetime(shifted["Date"], utc=True) - pd.Timedelta(days=8 * copy)).astype(str)
+        copies.append(shifted)
+    return pd.concat(copies, ignore_index=True)
+
+
+# Function to answer a query the obvious way: filter and sort the whole frame
+def naive_top_stories(frame, company, start, end, n):
+    rows = frame[
+        (frame["company_name"] == company)
+        & (frame["days_since_2000"] >= start)
+        & (frame["days_since_2000"] <= end)
+    ]
+    return rows.sort_values("Date", ascending=False).head(n)
+
+
+def timed(function, queries):
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        function(*query)
+        latencies.append(time.perf_counter() - started)
+    latencies = np.array(latencies) * 1000
+    return np.percentile(latencies, 50), np.percentile(latencies, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=NEWS_CSV_PATH)
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    frame = scaled_frame(args.csv, args.scale)
+    started = time.perf_counter()
+    store = NewsStore.from_frame(frame)
+    print(f"{len(store)} rows, {len(store.companies)} companies, loaded in {time.perf_counter() - started:.2f}s")
+
+    random.seed(0)
+    low, high = int(store.days.min()), int(store.days.max())
+    queries = []
+    for _ in range(args.queries):
+        start = random.randint(low, high)
+        queries.append((random.choice(store.companies), start, random.randint(start, high), args.top))
+
+    store_p50, store_p95 = timed(lambda c, s, e, n: store.top_stories(c, s, e, n), queries)
+    naive_p50, naive_p95 = timed(lambda c, s, e, n: naive_top_stories(frame, c, s, e, n), queries)
+    print(f"NewsStore.top_stories  p50 {store_p50:8.3f} ms  p95 {store_p95:8.3f} ms")
+    print(f"naive pandas filter    p50 {naive_p50:8.3f} ms  p95 {naive_p95:8.3f} ms")
+    print(f"speedup (p50)          {naive_p50 / store_p50:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
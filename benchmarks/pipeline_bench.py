@@ -0,0 +1,154 @@
+"""End-to-end benchmark of the Lab4 pipeline against the local stub backend.
+
+    $ python -m benchmarks.pipeline_bench --queries 50 --concurrency 4 --tokens-per-second 200
+
+Runs in a scratch working directory (so ChromaDB, the manifest and the
+caches start cold) with Lab4_datafiles linked in, and measures:
+
+  ingestion  create_lab4_collection(): time until the first passage is
+             searchable and until the background worker is done
+  retrieval  query_vector_db() per question
+  streaming  get_chatbot_response(), time to first token and to the end
+
+It reports throughput, p50/p95 latencies and peak memory. Every question
+is made unique so the query embedding cache does not hide the round trip.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+QUESTIONS = [
+    "What is IST 652 about?",
+    "Which course covers machine learning?",
+    "What are the prerequisites for the data science courses?",
+    "Which courses teach Python programming?",
+    "How are students graded in the database course?",
+    "What topics does the natural language processing course cover?",
+    "Who should take the information visualization course?",
+    "What projects are required in the capstone?",
+]
+
+
+def percentiles(values):
+    values = np.array(values) * 1000
+    return np.percentile(values, 50), np.percentile(values, 95)
+
+
+# Function to run one question through retrieval and streaming, returning its timings
+def run_question(lab4, collection, lexical_index, question):
+    from context_builder import build_context
+
+    started = time.perf_counter()
+    texts, _, ids, _ = lab4.query_vector_db(collection, question, lexical_index)
+    retrieved = time.perf_counter()
+    context, _, _ = build_context(list(zip(ids, texts)), lab4.CONTEXT_TOKEN_BUDGET)
+
+    first_token, pieces = None, 0
+    for _ in lab4.get_chatbot_response(question, context):
+        if first_token is None:
+            first_token = time.perf_counter()
+        pieces += 1
+    finished = time.perf_counter()
+    return {
+        "retrieval": retrieved - started,
+        "first_token": (first_token or finished) - retrieved,
+        "stream": finished - retrieved,
+        "total": finished - started,
+        "pieces": pieces,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf-dir", default=os.path.join(os.getcwd(), "Lab4_datafiles"))
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.0, help="stub seconds per request")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="stub streaming pace (0 = unpaced)")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch directory")
+    args = parser.parse_args()
+
+    # The backend is chosen when shared_resources is imported, so configure it first
+    os.environ["DOCQA_BACKEND"] = "stub"
+    os.environ["DOCQA_STUB_LATENCY"] = str(args.latency)
+    os.environ["DOCQA_STUB_TOKENS_PER_SECOND"] = str(args.tokens_per_second)
+
+    # Start cold: Lab4 keeps its ChromaDB files and caches under the working directory
+    repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    pdf_dir = os.path.abspath(args.pdf_dir)
+    workdir = tempfile.mkdtemp(prefix="pipeline_bench_")
+    os.symlink(pdf_dir, os.path.join(workdir, "Lab4_datafiles"))
+    os.chdir(workdir)
+    sys.path.insert(0, repo_dir)
+
+    import Lab4
+    from shared_resources import get_llm_gateway, get_openai_client
+
+    # Lab4 reads its key from st.secrets, which needs a Streamlit project; the stub accepts any key
+    Lab4.get_client = lambda: get_openai_client("stub")
+    Lab4.get_gateway = lambda: get_llm_gateway("stub")
+
+    tracemalloc.start()
+    try:
+        started = time.perf_counter()
+        collection, worker = Lab4.create_lab4_collection()
+        returned = time.perf_counter() - started
+        while not collection.count() and not worker.is_idle():
+            time.sleep(0.01)
+        first_passage = time.perf_counter() - started
+        worker.wait_until_idle()
+        cold = time.perf_counter() - started
+        lexical_index = worker.lexical_index()
+        chunks = collection.count()
+        pdfs = [name for name in os.listdir(pdf_dir) if name.lower().endswith(".pdf")]
+        print(f"ingestion   {len(pdfs)} PDFs, {chunks} chunks: page usable after {returned * 1000:.1f} ms, "
+              f"first passage searchable after {first_passage:.2f}s, all indexed after {cold:.2f}s "
+              f"({chunks / cold:.1f} chunks/s), {len(worker.status()['errors'])} errors")
+
+        questions = [f"{QUESTIONS[i % len(QUESTIONS)]} ({i})" for i in range(args.queries)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            results = list(executor.map(
+                lambda question: run_question(Lab4, collection, lexical_index, question), questions
+            ))
+        elapsed = time.perf_counter() - started
+
+        pieces = sum(result["pieces"] for result in results)
+        print(f"queries     {len(results)} at concurrency {args.concurrency}: {len(results) / elapsed:.1f} q/s, "
+              f"{pieces / elapsed:.0f} streamed pieces/s")
+        for name in ("retrieval", "first_token", "stream", "total"):
+            p50, p95 = percentiles([result[name] for result in results])
+            print(f"{name:<11} p50 {p50:9.2f} ms  p95 {p95:9.2f} ms")
+
+        _, peak = tracemalloc.get_traced_memory()
+        print(f"memory      peak Python allocations {peak / 2**20:.1f} MiB", end="")
+        if resource is not None:
+            # ru_maxrss is in KiB on Linux and bytes on macOS
+            maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            print(f", max RSS {maxrss / (2**20 if sys.platform == 'darwin' else 2**10):.1f} MiB")
+        else:
+            print()
+    finally:
+        tracemalloc.stop()
+        os.chdir(repo_dir)
+        if args.keep:
+            print(f"scratch directory kept at {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
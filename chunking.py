@@ -0,0 +1,66 @@
+import tiktoken
+
+
+# Default chunking parameters (in tokens)
+DEFAULT_CHUNK_TOKENS = 400
+DEFAULT_OVERLAP_TOKENS = 60
+
+# Bumped when chunk_pages() output changes, so existing indexes are rebuilt
+CHUNKING_VERSION = 2
+
+# Tokenizer used by text-embedding-3-* and gpt-4o-era models for counting
+ENCODING_NAME = "cl100k_base"
+
+_encoding = None
+
+
+# Function to get the (lazily loaded) tokenizer
+def get_encoding():
+    global _encoding
+    if _encoding is None:
+        _encoding = tiktoken.get_encoding(ENCODING_NAME)
+    return _encoding
+
+
+def chunk_pages(pages, chunk_tokens=DEFAULT_CHUNK_TOKENS, overlap_tokens=DEFAULT_OVERLAP_TOKENS):
+    """Split a list of page texts into overlapping token windows.
+
+    Each chunk is a dict with the chunk `text`, its `chunk_index` and the
+    1-based `page_start`/`page_end` it was taken from, so retrieval can
+    point back at the pages a passage came from.
+    """
+    if overlap_tokens >= chunk_tokens:
+        raise ValueError("overlap_tokens must be smaller than chunk_tokens")
+
+    encoding = get_encoding()
+
+    # Tokenize the whole document once, remembering which page each token belongs to.
+    # Pages are separated by a newline so the last word of one page and the first
+    # word of the next do not run together; the newline belongs to the earlier page.
+    separator = encoding.encode("\n")
+    tokens, token_pages = [], []
+    for page_number, page_text in enumerate(pages, start=1):
+        if not page_text:
+            continue
+        if tokens:
+            tokens.extend(separator)
+            token_pages.extend([token_pages[-1]] * len(separator))
+        page_tokens = encoding.encode(page_text)
+        tokens.extend(page_tokens)
+        token_pages.extend([page_number] * len(page_tokens))
+
+    chunks = []
+    step = chunk_tokens - overlap_tokens
+    for start in range(0, len(tokens), step):
+        end = min(start + chunk_tokens, len(tokens))
+        text = encoding.decode(tokens[start:end]).strip()
+        if text:
+            chunks.append({
+                "text": text,
+                "chunk_index": len(chunks),
+                "page_start": token_pages[start],
+                "page_end": token_pages[end - 1],
+            })
+        if end == len(tokens):
+            break
+    return chunks
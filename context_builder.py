@@ -0,0 +1,105 @@
+import re
+
+from chunking import get_encoding
+
+
+# Default number of prompt tokens spent on retrieved context
+DEFAULT_CONTEXT_BUDGET = 3000
+
+# Sentence ends, or line breaks (syllabi are mostly line-oriented text)
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+_SPACES_RE = re.compile(r"\s+")
+PASSAGE_SEPARATOR = "\n\n"
+
+# Characters a passage must share verbatim with the end of an earlier one to count as its continuation
+MIN_OVERLAP_CHARS = 20
+
+
+# Function to split a passage into sentences
+def split_sentences(text):
+    return [sentence.strip() for sentence in _SENTENCE_SPLIT_RE.split(text) if sentence.strip()]
+
+
+# Function to find the earlier passage that `text` continues (overlapping chunks of one file).
+# Returns (index in `earlier_texts`, length of the overlap) or None.
+def find_continued(text, earlier_texts):
+    head = text[:MIN_OVERLAP_CHARS]
+    if len(head) < MIN_OVERLAP_CHARS:
+        return None
+    for index, earlier in enumerate(earlier_texts):
+        start = earlier.find(head)
+        while start != -1:
+            # The rest of the earlier text must match the start of this one
+            length = min(len(earlier) - start, len(text))
+            if earlier[start:start + length] == text[:length]:
+                return index, length
+            start = earlier.find(head, start + 1)
+    return None
+
+
+def build_context(passages, budget_tokens=DEFAULT_CONTEXT_BUDGET):
+    """Assemble prompt context from `passages` within a token budget.
+
+    `passages` is a list of (id, text) pairs in relevance order. Sentences
+    (or lines) identical to one already in the context, such as the
+    overlap between neighbouring chunks, are dropped. Chunks overlap at
+    token boundaries, so a passage that starts inside an earlier one also
+    loses its leading sentence fragment. Passages are added sentence by
+    sentence until the next sentence would exceed `budget_tokens`, so the
+    context never ends mid-sentence. Returns (context, used_ids, token_count).
+    """
+    encoding = get_encoding()
+    separator_tokens = len(encoding.encode(PASSAGE_SEPARATOR))
+
+    # Each part is the list of (sentence, token cost) kept from one passage
+    parts, used_ids = [], []
+    seen = set()
+    used_tokens = 0
+    budget_left = True
+
+    earlier_texts, earlier_parts = [], []
+    for passage_id, text in passages:
+        if not budget_left:
+            break
+        sentences = split_sentences(text)
+        continued = find_continued(text, earlier_texts)
+        cut_tail = None
+        if continued is not None:
+            index, overlap = continued
+            # Cut-off tail of a sentence already in the context (or a repeat of a whole one)
+            sentences = sentences[1:]
+            overlapping = split_sentences(text[:overlap])
+            part = earlier_parts[index]
+            if (part is not None and len(parts[part]) > 1 and len(overlapping) > 1
+                    and overlapping[-1] != sentences[len(overlapping) - 2]
+                    and parts[part][-1][0] == overlapping[-1]):
+                # The earlier passage ends mid-sentence and this one has the whole sentence
+                cut_tail = part
+        earlier_texts.append(text)
+        earlier_parts.append(None)
+        kept = []
+        for sentence in sentences:
+            normalized = _SPACES_RE.sub(" ", sentence).lower()
+            if normalized in seen:
+                continue
+            cost = len(encoding.encode(sentence)) + 1
+            if not kept:
+                cost += separator_tokens if parts else 0
+            if used_tokens + cost > budget_tokens:
+                budget_left = False
+                break
+            if cut_tail is not None:
+                tail, tail_cost = parts[cut_tail].pop()
+                used_tokens -= tail_cost
+                seen.discard(_SPACES_RE.sub(" ", tail).lower())
+                cut_tail = None
+            kept.append((sentence, cost))
+            used_tokens += cost
+            seen.add(normalized)
+        if kept:
+            earlier_parts[-1] = len(parts)
+            parts.append(kept)
+            used_ids.append(passage_id)
+
+    context = PASSAGE_SEPARATOR.join("\n".join(sentence for sentence, _ in part) for part in parts)
+    return context, used_ids, len(encoding.encode(context))
@@ -0,0 +1,95 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from chunking import get_encoding
+
+
+# Default prompt tokens spent on conversation history (summary included)
+DEFAULT_HISTORY_BUDGET = 1500
+SUMMARY_MODEL = "gpt-4o-mini"
+SUMMARY_MAX_TOKENS = 300
+# Share of the budget the recent turns may fill before older ones are summarized
+SUMMARY_START_FRACTION = 0.75
+
+# Summaries are computed here, off the response path
+_summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="conversation-summary")
+
+
+class ConversationMemory:
+    """Chat history that fits a token budget.
+
+    The most recent turns are sent verbatim. Once they fill
+    SUMMARY_START_FRACTION of `budget_tokens` (minus the running summary),
+    the older ones are folded into a running summary by a background
+    thread, so no turn waits for a summary. A turn leaves the prompt only
+    once the summary covering it has landed, so nothing is dropped, and the
+    headroom keeps the prompt within the budget while a summary is running.
+    Synthetic messages (canned follow-ups) are never sent to the model.
+    """
+
+    def __init__(self, gateway, budget_tokens=DEFAULT_HISTORY_BUDGET, summary_model=SUMMARY_MODEL):
+        self.gateway = gateway
+        self.budget_tokens = budget_tokens
+        self.summary_model = summary_model
+        self.turns = []
+        self.summary = ""
+        # turns[:summarized] are covered by the summary
+        self.summarized = 0
+        self._pending = None
+        self._lock = threading.Lock()
+
+    def add(self, role, content, synthetic=False):
+        if synthetic:
+            return
+        encoding = get_encoding()
+        with self._lock:
+            self.turns.append({"role": role, "content": content, "tokens": len(encoding.encode(content)) + 4})
+
+    def context_messages(self):
+        """Return the messages to send: running summary plus the recent turns that fit."""
+        encoding = get_encoding()
+        with self._lock:
+            budget = self.budget_tokens
+            messages = []
+            if self.summary:
+                messages.append({"role": "system", "content": f"Summary of the earlier conversation: {self.summary}"})
+                budget -= len(encoding.encode(self.summary)) + 10
+
+            # Walk back from the newest turn to find the turns to summarize; the newest one is never summarized
+            cutoff = len(self.turns)
+            used = 0
+            while cutoff > self.summarized:
+                tokens = self.turns[cutoff - 1]["tokens"]
+                if used + tokens > budget * SUMMARY_START_FRACTION and cutoff < len(self.turns):
+                    break
+                used += tokens
+                cutoff -= 1
+            if cutoff > self.summarized:
+                self._schedule_summary(cutoff)
+
+            # Turns not covered by the summary yet stay in the prompt
+            messages.extend({"role": turn["role"], "content": turn["content"]} for turn in self.turns[self.summarized:])
+            return messages
+
+    def _schedule_summary(self, cutoff):
+        # Called with the lock held; one summary job at a time
+        if self._pending is not None and not self._pending.done():
+            return
+        turns = self.turns[self.summarized:cutoff]
+        self._pending = _summary_executor.submit(self._summarize, self.summary, turns, cutoff)
+
+    def _summarize(self, summary, turns, cutoff):
+        transcript = "\n".join(f"{turn['role']}: {turn['content']}" for turn in turns)
+        summary = self.gateway.complete_sync(
+            model=self.summary_model,
+            messages=[
+                {"role": "system", "content": "You maintain a concise running summary of a conversation. "
+                                              "Keep facts, names, numbers and open questions."},
+                {"role": "user", "content": f"Current summary:\n{summary or '(none)'}\n\n"
+                                            f"New turns:\n{transcript}\n\nReturn the updated summary."},
+            ],
+            max_tokens=SUMMARY_MAX_TOKENS,
+        )
+        with self._lock:
+            self.summary = summary.strip()
+            self.summarized = cutoff
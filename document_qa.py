@@ -0,0 +1,54 @@
+"""Settings and prompt helpers of the document question answering pipeline.
+
+Shared by the Lab4 page and the headless batch_qa.py, so neither has to
+import the other (and batch_qa.py does not load Streamlit).
+"""
+import re
+
+
+# Embedding model used for documents and questions
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Chat model used to answer questions
+CHAT_MODEL = "gpt-4o"
+
+# Number of chunks retrieved per question, and candidates taken from each retriever
+RETRIEVAL_TOP_K = 5
+DENSE_TOP_K = 10
+LEXICAL_TOP_K = 10
+
+# Prompt tokens spent on retrieved passages
+CONTEXT_TOKEN_BUDGET = 3000
+
+# Questions that are nothing but course codes ("IST 652") are answered from BM25 alone
+CODE_ONLY_QUERY_RE = re.compile(r"^\W*(?:[A-Za-z]{2,4}\s*-?\s*\d{3}\W*)+$")
+
+# BM25 index file, stored next to the ChromaDB files
+LEXICAL_INDEX_FILENAME = "lab4_bm25.json"
+
+
+# Function to format where a retrieved chunk came from
+def format_source(metadata):
+    filename = metadata["filename"]
+    if "page_start" not in metadata:
+        return filename
+    if metadata["page_start"] == metadata["page_end"]:
+        return f"{filename} (p. {metadata['page_start']})"
+    return f"{filename} (pp. {metadata['page_start']}-{metadata['page_end']})"
+
+
+# Function to build the chat messages answering a question from retrieved context
+def answer_messages(query, context):
+    # Construct the prompt for the GPT model
+    prompt = f"""You are an AI assistant with knowledge from specific documents. Use the following context to answer the user's question. If the information is not in the context, say you don't know based on the available information.
+
+Context:
+{context}
+
+User Question: {query}
+
+Answer:"""
+    return [
+        {"role": "system", "content": "You are a helpful assistant."},
+        {"role": "user", "content": prompt}
+    ]
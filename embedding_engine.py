@@ -0,0 +1,126 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import openai
+
+from chunking import get_encoding
+
+
+# Limits of the OpenAI embeddings endpoint
+MAX_INPUTS_PER_REQUEST = 2048
+MAX_TOKENS_PER_INPUT = 8191
+MAX_TOKENS_PER_REQUEST = 300_000
+
+# Errors worth retrying: rate limits, timeouts, dropped connections and 5xx
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+class EmbeddingEngine:
+    """Embed many texts with few, concurrent requests.
+
+    Texts are packed into batches bounded by the number of inputs and the
+    total token count of a request, the batches are sent concurrently on a
+    thread pool of `max_workers` threads, and retryable errors (429, 5xx,
+    timeouts) are retried with exponential backoff and jitter. Results are
+    returned in input order.
+    """
+
+    def __init__(self, client, model="text-embedding-3-small", max_workers=4,
+                 max_batch_inputs=MAX_INPUTS_PER_REQUEST,
+                 max_batch_tokens=MAX_TOKENS_PER_REQUEST // 2,
+                 max_retries=6, base_delay=1.0, max_delay=60.0):
+        # The engine retries on its own; client-level retries would multiply the attempts
+        self.client = client.with_options(max_retries=0)
+        self.model = model
+        self.max_workers = max_workers
+        self.max_batch_inputs = min(max_batch_inputs, MAX_INPUTS_PER_REQUEST)
+        self.max_batch_tokens = min(max_batch_tokens, MAX_TOKENS_PER_REQUEST)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+
+    def make_batches(self, texts):
+        """Split `texts` into lists of (index, text) that fit in one request."""
+        encoding = get_encoding()
+        batches, batch, batch_tokens = [], [], 0
+        for index, text in enumerate(texts):
+            tokens = encoding.encode(text or " ")
+            if len(tokens) > MAX_TOKENS_PER_INPUT:
+                # The endpoint rejects over-long inputs; embed their head instead
+                tokens = tokens[:MAX_TOKENS_PER_INPUT]
+                text = encoding.decode(tokens)
+            if batch and (len(batch) >= self.max_batch_inputs
+                          or batch_tokens + len(tokens) > self.max_batch_tokens):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append((index, text or " "))
+            batch_tokens += len(tokens)
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def embed(self, texts):
+        """Return the embeddings of `texts`, in the same order."""
+        texts = list(texts)
+        if not texts:
+            return []
+
+        embeddings = [None] * len(texts)
+        batches = self.make_batches(texts)
+        if len(batches) == 1 or self.max_workers <= 1:
+            results = map(self._embed_batch, batches)
+            for batch, vectors in zip(batches, results):
+                for (index, _), vector in zip(batch, vectors):
+                    embeddings[index] = vector
+            return embeddings
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as executor:
+            for batch, vectors in zip(batches, executor.map(self._embed_batch, batches)):
+                for (index, _), vector in zip(batch, vectors):
+                    embeddings[index] = vector
+        return embeddings
+
+    def embed_one(self, text):
+        return self.embed([text])[0]
+
+    def _embed_batch(self, batch):
+        attempt = 0
+        while True:
+            try:
+                with self._stats_lock:
+                    self.requests += 1
+                response = self.client.embeddings.create(
+                    input=[text for _, text in batch], model=self.model
+                )
+                # The API may return the items in any order; sort them back
+                data = sorted(response.data, key=lambda item: item.index)
+                return [item.embedding for item in data]
+            except RETRYABLE_ERRORS as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                with self._stats_lock:
+                    self.retries += 1
+                time.sleep(self._backoff_delay(attempt, e))
+
+    def _backoff_delay(self, attempt, error):
+        # Honor the server's Retry-After header when there is one
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_delay)
+            except ValueError:
+                pass
+        delay = min(self.base_delay * (2 ** (attempt - 1)), self.max_delay)
+        return delay * (0.5 + random.random() / 2)
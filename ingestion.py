@@ -0,0 +1,226 @@
+import hashlib
+import json
+import os
+
+from chunking import CHUNKING_VERSION, DEFAULT_CHUNK_TOKENS, DEFAULT_OVERLAP_TOKENS, chunk_pages
+from embedding_engine import MAX_INPUTS_PER_REQUEST
+from pdf_extract import PageTextCache, iter_extracted_pages
+from tracing import count, span
+
+
+# Name of the manifest file kept next to the ChromaDB files
+MANIFEST_FILENAME = "lab4_manifest.json"
+
+# Directory (next to the manifest) holding the extracted page texts
+PAGE_CACHE_DIRNAME = "page_cache"
+
+
+# Function to compute the SHA-256 of a file without loading it all in memory
+def file_sha256(filepath, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Function to load the ingestion manifest (empty if missing or unreadable)
+def load_manifest(manifest_path):
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return {"files": {}}
+    manifest.setdefault("files", {})
+    return manifest
+
+
+# Function to write the manifest atomically so a crash never leaves it half written
+def save_manifest(manifest_path, manifest):
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+def plan_ingestion(pdf_dir, manifest):
+    """Compare the PDFs on disk against the manifest.
+
+    Returns (changed, unchanged, removed): `changed` is a list of
+    (filename, entry) pairs that must be (re-)embedded, `unchanged` the
+    filenames that can be skipped and `removed` the filenames that are in
+    the manifest but no longer on disk. Files whose size and mtime match
+    the manifest are skipped without being hashed; otherwise the content
+    hash decides, so a touched but identical file is not re-embedded.
+    """
+    known = manifest["files"]
+    changed, unchanged = [], []
+    on_disk = set()
+
+    for filename in sorted(os.listdir(pdf_dir)):
+        if not filename.endswith(".pdf"):
+            continue
+        filepath = os.path.join(pdf_dir, filename)
+        stat = os.stat(filepath)
+        on_disk.add(filename)
+
+        entry = {"size": stat.st_size, "mtime": stat.st_mtime}
+        previous = known.get(filename)
+        if previous and previous["size"] == entry["size"] and previous["mtime"] == entry["mtime"]:
+            unchanged.append(filename)
+            continue
+
+        entry["sha256"] = file_sha256(filepath)
+        if previous and previous.get("sha256") == entry["sha256"]:
+            # Same content, only the timestamp moved: refresh the manifest entry
+            known[filename] = entry
+            unchanged.append(filename)
+            continue
+
+        changed.append((filename, entry))
+
+    removed = sorted(set(known) - on_disk)
+    return changed, unchanged, removed
+
+
+# Function to build the ChromaDB id of a chunk
+def chunk_id(filename, chunk_index):
+    return f"{filename}::{chunk_index}"
+
+
+# Function to write the chunks of one file (and only them) to ChromaDB
+def upsert_file_chunks(collection, filename, chunks, embeddings):
+    collection.delete(where={"filename": filename})
+    if not chunks:
+        return
+    collection.upsert(
+        documents=[chunk["text"] for chunk in chunks],
+        metadatas=[
+            {
+                "filename": filename,
+                "chunk_index": chunk["chunk_index"],
+                "page_start": chunk["page_start"],
+                "page_end": chunk["page_end"],
+            }
+            for chunk in chunks
+        ],
+        ids=[chunk_id(filename, chunk["chunk_index"]) for chunk in chunks],
+        embeddings=embeddings
+    )
+
+
+def sync_collection(collection, embedding_engine, pdf_dir, manifest_path, on_error=None,
+                    chunk_tokens=DEFAULT_CHUNK_TOKENS, overlap_tokens=DEFAULT_OVERLAP_TOKENS,
+                    chunks_per_round=4 * MAX_INPUTS_PER_REQUEST,
+                    pdf_backend="auto", max_workers=None, on_progress=None):
+    """Bring `collection` in line with the PDFs in `pdf_dir`.
+
+    Only new or modified PDFs are extracted, split into overlapping token
+    chunks and embedded; PDFs deleted from disk have their chunks removed
+    from the collection. Chunks of several files are embedded together by
+    `embedding_engine` in rounds of up to `chunks_per_round` chunks, so a
+    large corpus costs few, concurrent requests. Text extraction of large
+    batches runs on a process pool (see pdf_extract.iter_extracted_pages)
+    and page texts are cached on disk by content hash next to the manifest.
+    The manifest is saved as soon as a file is stored so an interrupted run
+    resumes where it stopped, and changing the chunking parameters or
+    embedding model re-indexes everything. `on_progress(filename, done,
+    total)` is called whenever a new or modified file has been stored (or
+    has failed).
+    Returns a dict with the filenames that were indexed, skipped and removed.
+    """
+    settings = {"model": embedding_engine.model, "chunk_tokens": chunk_tokens, "overlap_tokens": overlap_tokens,
+                "chunking_version": CHUNKING_VERSION}
+
+    manifest = load_manifest(manifest_path)
+    if manifest["files"] and (collection.count() == 0 or manifest.get("settings") != settings):
+        # The collection was wiped or built with other settings: start over
+        for filename in manifest["files"]:
+            collection.delete(where={"filename": filename})
+        manifest = {"files": {}}
+    manifest["settings"] = settings
+    with span("ingestion.plan") as current:
+        changed, unchanged, removed = plan_ingestion(pdf_dir, manifest)
+        current.set(changed=len(changed), unchanged=len(unchanged), removed=len(removed))
+    page_cache = PageTextCache(os.path.join(os.path.dirname(manifest_path), PAGE_CACHE_DIRNAME))
+
+    for filename in removed:
+        collection.delete(where={"filename": filename})
+        page_cache.discard(manifest["files"].pop(filename).get("sha256"))
+        save_manifest(manifest_path, manifest)
+
+    indexed = []
+    done = 0
+
+    # Function to report that one of the changed files is finished
+    def finished(filename):
+        nonlocal done
+        done += 1
+        if on_progress is not None:
+            on_progress(filename, done, len(changed))
+
+    # Function to embed the pending files together and store each of them
+    def flush(pending):
+        texts = [chunk["text"] for _, _, chunks in pending for chunk in chunks]
+        try:
+            with span("ingestion.embed", files=len(pending), chunks=len(texts)):
+                embeddings = embedding_engine.embed(texts)
+        except Exception as e:
+            for filename, _, _ in pending:
+                if on_error is not None:
+                    on_error(filename, e)
+                finished(filename)
+            return
+        offset = 0
+        for filename, entry, chunks in pending:
+            file_embeddings = embeddings[offset:offset + len(chunks)]
+            offset += len(chunks)
+            try:
+                with span("ingestion.upsert", file=filename, chunks=len(chunks)):
+                    upsert_file_chunks(collection, filename, chunks, file_embeddings)
+            except Exception as e:
+                if on_error is not None:
+                    on_error(filename, e)
+                finished(filename)
+                continue
+            previous = manifest["files"].get(filename)
+            if previous and previous.get("sha256") not in (None, entry["sha256"]):
+                page_cache.discard(previous["sha256"])
+            manifest["files"][filename] = entry
+            save_manifest(manifest_path, manifest)
+            indexed.append(filename)
+            finished(filename)
+
+    entries = {os.path.join(pdf_dir, filename): (filename, entry) for filename, entry in changed}
+    extracted = iter_extracted_pages(
+        [(filepath, entry["sha256"]) for filepath, (_, entry) in entries.items()],
+        cache=page_cache, backend=pdf_backend, max_workers=max_workers,
+    )
+
+    pending, pending_chunks = [], 0
+    for filepath, pages, error in extracted:
+        filename, entry = entries[filepath]
+        try:
+            if error is not None:
+                raise error
+            with span("ingestion.chunk", file=filename, pages=len(pages)):
+                chunks = chunk_pages(pages, chunk_tokens, overlap_tokens)
+            count("ingestion.pages", len(pages))
+            count("ingestion.chunks", len(chunks))
+        except Exception as e:
+            if on_error is not None:
+                on_error(filename, e)
+            finished(filename)
+            continue
+        pending.append((filename, entry, chunks))
+        pending_chunks += len(chunks)
+        if pending_chunks >= chunks_per_round:
+            flush(pending)
+            pending, pending_chunks = [], 0
+    if pending:
+        flush(pending)
+
+    # Persist the settings and refreshed mtimes of files that were hashed but unchanged
+    save_manifest(manifest_path, manifest)
+
+    return {"indexed": indexed, "skipped": unchanged, "removed": removed}
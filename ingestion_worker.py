@@ -0,0 +1,177 @@
+import os
+import queue
+import threading
+import time
+
+from ingestion import sync_collection
+from lexical_index import BM25Index, build_from_collection
+from tracing import span
+
+
+# Seconds between two looks at the PDF directory
+DEFAULT_POLL_INTERVAL = 5.0
+# Chunks embedded per round; small rounds make files searchable sooner
+PROGRESSIVE_CHUNKS_PER_ROUND = 256
+# Seconds before files that could not be indexed are retried, doubled after every failed retry
+RETRY_INTERVAL = 30.0
+MAX_RETRY_INTERVAL = 600.0
+
+
+# Function to fingerprint the PDFs of a directory by name, size and modification time
+def directory_signature(pdf_dir):
+    try:
+        entries = [entry for entry in os.scandir(pdf_dir) if entry.is_file() and entry.name.lower().endswith(".pdf")]
+    except FileNotFoundError:
+        return None
+    return sorted((entry.name, entry.stat().st_size, entry.stat().st_mtime_ns) for entry in entries)
+
+
+class IngestionWorker:
+    """Keeps a collection in sync with a PDF directory from a background thread.
+
+    Syncs are requested through a queue (`request_sync()`); with `watch`
+    on, the directory is also polled every `poll_interval` seconds and
+    re-synced when PDFs are added, modified or deleted. Files that could
+    not be indexed (e.g. embedding retries ran out) are retried after
+    RETRY_INTERVAL seconds, doubling the delay while they keep failing.
+    Files are embedded in small rounds and stored as soon as they are
+    ready, so the collection can be queried while indexing goes on; `status()` reports progress and
+    `lexical_index()` returns a BM25 index matching what is stored so far.
+    """
+
+    def __init__(self, collection, embedding_engine, pdf_dir, manifest_path, lexical_index_path,
+                 watch=True, poll_interval=DEFAULT_POLL_INTERVAL, chunks_per_round=PROGRESSIVE_CHUNKS_PER_ROUND):
+        self.collection = collection
+        self.embedding_engine = embedding_engine
+        self.pdf_dir = pdf_dir
+        self.manifest_path = manifest_path
+        self.lexical_index_path = lexical_index_path
+        self.watch = watch
+        self.poll_interval = poll_interval
+        self.chunks_per_round = chunks_per_round
+
+        self._requests = queue.Queue()
+        self._lock = threading.Lock()
+        self._lexical_lock = threading.Lock()
+        self._lexical_index = None
+        self._lexical_stale = False
+        self._signature = None
+        self._retry_at = None
+        self._retry_interval = RETRY_INTERVAL
+        self._thread = None
+        self._status = {
+            "state": "starting",
+            "done": 0,
+            "total": 0,
+            "current": None,
+            "errors": [],
+            "last_result": None,
+            "last_sync": None,
+        }
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="ingestion-worker", daemon=True)
+                self._thread.start()
+        self.request_sync("startup")
+        return self
+
+    def request_sync(self, reason="manual"):
+        with self._lock:
+            if self._status["state"] != "indexing":
+                self._status["state"] = "queued"
+        self._requests.put(reason)
+
+    def status(self):
+        with self._lock:
+            status = dict(self._status)
+            status["errors"] = list(status["errors"])
+            return status
+
+    def is_idle(self):
+        return self.status()["state"] in ("ready", "failed")
+
+    def wait_until_idle(self, timeout=None):
+        """Block until no sync is queued or running; returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.is_idle():
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def lexical_index(self):
+        """Return the BM25 index of the stored chunks, rebuilding it if files were stored since."""
+        with self._lexical_lock:
+            if self._lexical_index is None and not self._lexical_stale and os.path.exists(self.lexical_index_path):
+                self._lexical_index = BM25Index.load(self.lexical_index_path)
+            elif self._lexical_stale or self._lexical_index is None:
+                self._lexical_index = build_from_collection(self.collection, self.lexical_index_path)
+                self._lexical_stale = False
+            return self._lexical_index
+
+    def _update(self, **changes):
+        with self._lock:
+            self._status.update(changes)
+
+    def _run(self):
+        while True:
+            try:
+                polling = self.watch or self._retry_at is not None
+                self._requests.get(timeout=self.poll_interval if polling else None)
+            except queue.Empty:
+                # Nothing requested: sync only if the directory changed or failed files are due
+                retry_due = self._retry_at is not None and time.monotonic() >= self._retry_at
+                if not retry_due and (not self.watch or directory_signature(self.pdf_dir) == self._signature):
+                    continue
+            # Several requests queued while syncing are served by one sync
+            while not self._requests.empty():
+                self._requests.get_nowait()
+            self._sync()
+
+    def _schedule_retry(self, errors):
+        # Failed files are not in the manifest, so the retry sync picks them up again
+        if errors:
+            self._retry_at = time.monotonic() + self._retry_interval
+            self._retry_interval = min(2 * self._retry_interval, MAX_RETRY_INTERVAL)
+        else:
+            self._retry_at, self._retry_interval = None, RETRY_INTERVAL
+
+    def _sync(self):
+        errors = []
+
+        def on_progress(filename, done, total):
+            self._update(done=done, total=total, current=filename)
+            self._lexical_stale = True
+
+        signature = directory_signature(self.pdf_dir)
+        self._update(state="indexing", done=0, total=0, current=None)
+        try:
+            with span("ingestion.sync"):
+                result = sync_collection(
+                    self.collection,
+                    self.embedding_engine,
+                    self.pdf_dir,
+                    self.manifest_path,
+                    on_error=lambda filename, e: errors.append(f"Error processing {filename}: {str(e)}"),
+                    chunks_per_round=self.chunks_per_round,
+                    on_progress=on_progress,
+                )
+        except Exception as e:
+            errors.append(f"Error syncing {self.pdf_dir}: {str(e)}")
+            self._signature = signature
+            self._schedule_retry(errors)
+            self._update(state="failed" if self._requests.empty() else "queued", errors=errors, current=None, last_sync=time.time())
+            return
+
+        self._signature = signature
+        self._schedule_retry(errors)
+        with self._lexical_lock:
+            if result["indexed"] or result["removed"] or not os.path.exists(self.lexical_index_path):
+                self._lexical_index = build_from_collection(self.collection, self.lexical_index_path)
+            elif self._lexical_index is None:
+                self._lexical_index = BM25Index.load(self.lexical_index_path)
+            self._lexical_stale = False
+        self._update(state="ready" if self._requests.empty() else "queued", errors=errors, current=None, last_sync=time.time(),
+                     last_result={key: len(value) for key, value in result.items()})
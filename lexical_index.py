@@ -0,0 +1,119 @@
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+# Course codes such as "IST 652", "IST-652" or "IST652"
+COURSE_CODE_RE = re.compile(r"\b([a-z]{2,4})\s*-?\s*(\d{3})\b")
+
+
+# Function to split a text into BM25 terms (course codes are also kept as one term)
+def tokenize(text):
+    text = text.lower()
+    tokens = _WORD_RE.findall(text)
+    tokens.extend(prefix + number for prefix, number in COURSE_CODE_RE.findall(text))
+    return tokens
+
+
+class BM25Index:
+    """Okapi BM25 index over the chunks of a collection.
+
+    Stores the chunk ids, texts and metadata alongside the postings, so
+    lexical hits can be turned into context without touching ChromaDB or
+    the embeddings API.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids = []
+        self.documents = []
+        self.metadatas = []
+        self.doc_lengths = []
+        self.postings = {}
+        self.avg_length = 0.0
+
+    @classmethod
+    def build(cls, ids, documents, metadatas, **kwargs):
+        index = cls(**kwargs)
+        index.ids = list(ids)
+        index.documents = list(documents)
+        index.metadatas = list(metadatas)
+        postings = defaultdict(dict)
+        for position, document in enumerate(index.documents):
+            counts = Counter(tokenize(document or ""))
+            index.doc_lengths.append(sum(counts.values()))
+            for term, frequency in counts.items():
+                postings[term][position] = frequency
+        index.postings = dict(postings)
+        index.avg_length = sum(index.doc_lengths) / len(index.doc_lengths) if index.doc_lengths else 0.0
+        return index
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, query, k=10):
+        """Return up to `k` (position, score) pairs, best first."""
+        if not self.ids:
+            return []
+        scores = defaultdict(float)
+        total = len(self.ids)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for position, frequency in postings.items():
+                length_norm = 1 - self.b + self.b * self.doc_lengths[position] / (self.avg_length or 1.0)
+                scores[position] += idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def save(self, path):
+        data = {
+            "k1": self.k1, "b": self.b, "ids": self.ids, "documents": self.documents,
+            "metadatas": self.metadatas, "doc_lengths": self.doc_lengths,
+            # JSON object keys are strings; store postings as lists of pairs
+            "postings": {term: list(postings.items()) for term, postings in self.postings.items()},
+        }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(data, file)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        index = cls(k1=data["k1"], b=data["b"])
+        index.ids = data["ids"]
+        index.documents = data["documents"]
+        index.metadatas = data["metadatas"]
+        index.doc_lengths = data["doc_lengths"]
+        index.postings = {term: dict(pairs) for term, pairs in data["postings"].items()}
+        index.avg_length = sum(index.doc_lengths) / len(index.doc_lengths) if index.doc_lengths else 0.0
+        return index
+
+
+# Function to rebuild the BM25 index from everything stored in a collection
+def build_from_collection(collection, path=None):
+    contents = collection.get(include=["documents", "metadatas"])
+    index = BM25Index.build(contents["ids"], contents["documents"], contents["metadatas"])
+    if path:
+        index.save(path)
+    return index
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuse several ranked lists of ids with reciprocal rank fusion.
+
+    Every id scores sum(1 / (k + rank)) over the lists it appears in.
+    Returns the ids ordered by fused score, best first.
+    """
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] += 1.0 / (k + rank)
+    return sorted(scores, key=lambda item_id: scores[item_id], reverse=True)
@@ -0,0 +1,185 @@
+"""One async gateway in front of the chat completions API, shared by every lab.
+
+All requests run on async_bridge's event loop through one AsyncOpenAI
+client (one connection pool), under a process-wide concurrency cap and
+requests-per-minute pace. Identical requests (same model, messages and
+options) that are in flight at the same time are sent upstream once: a
+streamed answer is fanned out to every waiter, and a session joining late
+first gets the pieces already received. Script threads use the `*_sync`
+methods; async code (Lab5) awaits the others.
+"""
+import asyncio
+import json
+import time
+
+from async_bridge import iter_async, run_async
+from tracing import count, observe, span
+
+
+DEFAULT_MAX_CONCURRENCY = 16
+DEFAULT_REQUESTS_PER_MINUTE = 500
+# Retries of 429s and 5xx done by the OpenAI client (with its own backoff)
+DEFAULT_MAX_RETRIES = 5
+
+
+# Function to build the key under which identical requests are coalesced
+def request_key(request):
+    return json.dumps(request, sort_keys=True, default=str)
+
+
+class _SharedStream:
+    """Pieces of one upstream stream, readable from the start by any number of waiters."""
+
+    def __init__(self):
+        self.pieces = []
+        self.done = False
+        self.error = None
+        self.changed = asyncio.Condition()
+
+    async def publish(self, piece):
+        async with self.changed:
+            self.pieces.append(piece)
+            self.changed.notify_all()
+
+    async def finish(self, error=None):
+        async with self.changed:
+            self.done = True
+            self.error = error
+            self.changed.notify_all()
+
+    async def subscribe(self):
+        index = 0
+        while True:
+            async with self.changed:
+                await self.changed.wait_for(lambda: index < len(self.pieces) or self.done)
+                pieces = self.pieces[index:]
+                done, error = self.done, self.error
+            for piece in pieces:
+                yield piece
+            index += len(pieces)
+            if done and index == len(self.pieces):
+                if error is not None:
+                    raise error
+                return
+
+
+class LLMGateway:
+    """Rate-limited, coalescing access to chat completions (see the module docstring).
+
+    `requests`, `coalesced` and `in_flight` count upstream requests,
+    requests served by another one in flight, and current upstream requests.
+    """
+
+    def __init__(self, client, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, max_retries=DEFAULT_MAX_RETRIES):
+        self.client = client.with_options(max_retries=max_retries)
+        self.max_concurrency = max_concurrency
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        # Created on the loop the first time they are needed
+        self._semaphore = None
+        self._next_start = 0.0
+        self._streams = {}
+        self._results = {}
+        self.requests = 0
+        self.coalesced = 0
+        self.in_flight = 0
+
+    async def _slot(self):
+        # Pace request starts, then wait for a free concurrency slot
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        if self.interval:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.interval
+            if start > now:
+                await asyncio.sleep(start - now)
+        await self._semaphore.acquire()
+        self.requests += 1
+        self.in_flight += 1
+
+    def _release(self):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    async def create(self, **request):
+        """Return the (non-streamed) completion for `request`, sharing identical in-flight calls."""
+        key = request_key(request)
+        task = self._results.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._create(request))
+            self._results[key] = task
+            task.add_done_callback(lambda _: self._results.pop(key, None))
+        else:
+            self.coalesced += 1
+            count("llm_gateway.coalesced")
+        # A waiter that gives up must not cancel the call for the others
+        return await asyncio.shield(task)
+
+    async def _create(self, request):
+        await self._slot()
+        try:
+            with span("llm_gateway.create", model=request.get("model")):
+                return await self.client.chat.completions.create(**request)
+        finally:
+            self._release()
+
+    async def complete(self, **request):
+        """Return the text of the completion for `request`."""
+        response = await self.create(**request)
+        return response.choices[0].message.content or ""
+
+    async def stream(self, **request):
+        """Async iterator over the text pieces of a streamed completion for `request`."""
+        key = request_key(request)
+        shared = self._streams.get(key)
+        if shared is None:
+            shared = _SharedStream()
+            self._streams[key] = shared
+            # Runs to the end even if every waiter leaves, so a late joiner can still use it
+            asyncio.ensure_future(self._produce(key, shared, request))
+        else:
+            self.coalesced += 1
+            count("llm_gateway.coalesced")
+        async for piece in shared.subscribe():
+            yield piece
+
+    async def _produce(self, key, shared, request):
+        error = None
+        try:
+            await self._slot()
+            try:
+                with span("llm_gateway.stream", model=request.get("model")):
+                    started = time.perf_counter()
+                    first = True
+                    stream = await self.client.chat.completions.create(stream=True, **request)
+                    async for chunk in stream:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            if first:
+                                observe("llm_gateway.first_token", time.perf_counter() - started,
+                                        model=request.get("model"))
+                                first = False
+                            await shared.publish(chunk.choices[0].delta.content)
+            finally:
+                self._release()
+        except Exception as e:
+            error = e
+        finally:
+            # Later identical requests start a new call
+            self._streams.pop(key, None)
+            await shared.finish(error)
+
+    # Blocking versions for Streamlit script threads and worker threads
+
+    def create_sync(self, **request):
+        return run_async(self.create(**request))
+
+    def complete_sync(self, **request):
+        return run_async(self.complete(**request))
+
+    def stream_sync(self, **request):
+        """Iterate the text pieces of a streamed completion."""
+        return iter_async(self.stream(**request))
+
+    def stats(self):
+        return {"requests": self.requests, "coalesced": self.coalesced, "in_flight": self.in_flight}
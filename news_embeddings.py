@@ -0,0 +1,171 @@
+"""Precomputed embedding matrix for the news corpus.
+
+Build it once (batched and resumable; re-running continues where it stopped):
+
+    $ python news_embeddings.py --csv News_Data/news_data.csv --out News_Data/embeddings
+
+The matrix is a float16 (or float32) .npy file opened with mmap_mode="r",
+so every app process shares the same pages through the OS page cache
+instead of loading its own copy into the heap.
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from news_store import NEWS_CSV_PATH
+
+
+EMBEDDINGS_DIR = "News_Data/embeddings"
+MATRIX_FILENAME = "news_embeddings.npy"
+ROW_IDS_FILENAME = "news_row_ids.npy"
+PROGRESS_FILENAME = "progress.json"
+
+# Rows scored per block, bounding the float32 copy made while searching
+SEARCH_BLOCK_ROWS = 65536
+
+
+# Function to read/write the build progress file
+def load_progress(out_dir):
+    try:
+        with open(os.path.join(out_dir, PROGRESS_FILENAME), "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def save_progress(out_dir, progress):
+    path = os.path.join(out_dir, PROGRESS_FILENAME)
+    with open(path + ".tmp", "w", encoding="utf-8") as file:
+        json.dump(progress, file)
+    os.replace(path + ".tmp", path)
+
+
+def build_news_embeddings(embedding_engine, csv_path=NEWS_CSV_PATH, out_dir=EMBEDDINGS_DIR,
+                          dtype="float16", batch_rows=2048, on_progress=None):
+    """Embed the Document column of `csv_path` into a memory-mapped matrix.
+
+    Row i of the matrix is the embedding of CSV row `row_ids[i]`. Progress
+    is recorded after every batch of `batch_rows` rows, so an interrupted
+    build resumes from the last completed batch.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    total_rows = sum(len(chunk) for chunk in pd.read_csv(csv_path, usecols=["Document"], chunksize=65536))
+
+    progress = load_progress(out_dir)
+    settings = {"model": embedding_engine.model, "dtype": dtype, "rows": total_rows}
+    if progress is None or progress.get("settings") != settings:
+        progress = {"settings": settings, "rows_done": 0}
+
+    matrix_path = os.path.join(out_dir, MATRIX_FILENAME)
+    matrix = np.load(matrix_path, mmap_mode="r+") if progress["rows_done"] else None
+
+    rows_seen = 0
+    for chunk in pd.read_csv(csv_path, usecols=["Document"], chunksize=batch_rows):
+        chunk_start, rows_seen = rows_seen, rows_seen + len(chunk)
+        if rows_seen <= progress["rows_done"]:
+            continue
+        skip = progress["rows_done"] - chunk_start
+        texts = chunk["Document"].fillna("").astype(str).tolist()[skip:]
+
+        vectors = np.asarray(embedding_engine.embed(texts), dtype=np.float32)
+        if matrix is None:
+            matrix = np.lib.format.open_memmap(matrix_path, mode="w+", dtype=dtype,
+                                               shape=(total_rows, vectors.shape[1]))
+        matrix[progress["rows_done"]:rows_seen] = vectors
+        matrix.flush()
+
+        progress["rows_done"] = rows_seen
+        save_progress(out_dir, progress)
+        if on_progress is not None:
+            on_progress(rows_seen, total_rows)
+
+    np.save(os.path.join(out_dir, ROW_IDS_FILENAME), np.arange(total_rows, dtype=np.int64))
+    return progress
+
+
+class NewsVectorIndex:
+    """Read-only, memory-mapped view of the news embedding matrix."""
+
+    def __init__(self, matrix, row_ids):
+        self.matrix = matrix
+        self.row_ids = row_ids
+
+    @classmethod
+    def open(cls, out_dir=EMBEDDINGS_DIR):
+        progress = load_progress(out_dir)
+        if progress is None or progress["rows_done"] < progress["settings"]["rows"]:
+            raise FileNotFoundError(f"No complete news embedding build in {out_dir}")
+        matrix = np.load(os.path.join(out_dir, MATRIX_FILENAME), mmap_mode="r")
+        row_ids = np.load(os.path.join(out_dir, ROW_IDS_FILENAME), mmap_mode="r")
+        return cls(matrix, row_ids)
+
+    def search(self, query_vectors, top_n=10, rows=None, block_rows=SEARCH_BLOCK_ROWS):
+        """Return (row_ids, scores) of the best matches for each query vector.
+
+        `query_vectors` is one vector or a (queries, dimensions) array; the
+        results are then (queries, top_n) arrays. `rows` optionally limits
+        the search to these CSV rows (e.g. one company and date range).
+        """
+        queries = np.atleast_2d(np.asarray(query_vectors, dtype=np.float32))
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True) + 1e-12
+
+        # Matrix rows to score: all of them, or the ones of the pre-filtered CSV rows
+        if rows is None:
+            candidates = None
+            count = len(self.row_ids)
+        else:
+            candidates = np.searchsorted(self.row_ids, np.asarray(rows, dtype=np.int64))
+            count = len(candidates)
+
+        scores = np.empty((len(queries), count), dtype=np.float32)
+        for start in range(0, count, block_rows):
+            stop = min(start + block_rows, count)
+            if candidates is None:
+                block = self.matrix[start:stop]
+            else:
+                block = self.matrix[candidates[start:stop]]
+            scores[:, start:stop] = queries @ block.astype(np.float32).T
+
+        top_n = min(top_n, count)
+        if top_n == 0:
+            empty = np.empty((len(queries), 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+        best = np.argpartition(-scores, top_n - 1, axis=1)[:, :top_n]
+        best_scores = np.take_along_axis(scores, best, axis=1)
+        order = np.argsort(-best_scores, axis=1)
+        best = np.take_along_axis(best, order, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+
+        matrix_rows = best if candidates is None else candidates[best]
+        result_ids = np.asarray(self.row_ids)[matrix_rows]
+        if np.ndim(query_vectors) == 1:
+            return result_ids[0], best_scores[0]
+        return result_ids, best_scores
+
+
+def main():
+    from embedding_engine import EmbeddingEngine
+    from shared_resources import get_openai_client
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=NEWS_CSV_PATH)
+    parser.add_argument("--out", default=EMBEDDINGS_DIR)
+    parser.add_argument("--model", default="text-embedding-3-small")
+    parser.add_argument("--dtype", choices=["float16", "float32"], default="float16")
+    parser.add_argument("--batch-rows", type=int, default=2048)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    engine = EmbeddingEngine(get_openai_client(os.environ.get("OPENAI_API_KEY")),
+                             model=args.model, max_workers=args.workers)
+    build_news_embeddings(
+        engine, args.csv, args.out, args.dtype, args.batch_rows,
+        on_progress=lambda done, total: print(f"{done}/{total} rows embedded"),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""Streaming, de-duplicating ingestion of news CSV files into ChromaDB.
+
+    $ python news_ingest.py --csv News_Data/news_data.csv
+
+The file is read record by record in bounded batches, so memory use does
+not depend on the file size. The byte offset of the last stored record is
+saved after each batch; when the feed appends rows to the file, the next run
+only reads the new tail. Stories are skipped if their URL was already
+ingested or if their text is a near duplicate of an ingested story.
+"""
+import argparse
+import csv
+import datetime
+import hashlib
+import json
+import os
+import re
+import sqlite3
+
+import numpy as np
+
+from news_store import EPOCH, NEWS_CSV_PATH, normalize_company
+
+
+# Stories whose 64-bit SimHashes differ in at most this many bits are near duplicates
+SIMHASH_MAX_DISTANCE = 3
+# The hash is split into this many bands; two hashes within the distance share at least one band
+SIMHASH_BANDS = 4
+
+_WORD_RE = re.compile(r"\w+")
+_SPACES_RE = re.compile(r"\s+")
+_BIT_POSITIONS = np.arange(64, dtype=np.uint64)
+
+
+# Function to compute the 64-bit SimHash of a text (words and word pairs as features)
+def simhash(text):
+    words = _WORD_RE.findall(text.lower())
+    features = words + [a + " " + b for a, b in zip(words, words[1:])]
+    if not features:
+        return 0
+    hashes = np.frombuffer(
+        b"".join(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest() for feature in features),
+        dtype="<u8",
+    )
+    # Per bit: how many features have it set, against how many do not
+    bits = (hashes[:, None] >> _BIT_POSITIONS) & np.uint64(1)
+    set_bits = np.flatnonzero(2 * bits.sum(axis=0) > len(features))
+    return sum(1 << int(bit) for bit in set_bits)
+
+
+# Function to split a SimHash into its bands
+def simhash_bands(value):
+    width = 64 // SIMHASH_BANDS
+    return [(value >> (band * width)) & ((1 << width) - 1) for band in range(SIMHASH_BANDS)]
+
+
+def iter_csv_records(path, start_offset=0):
+    """Yield (record, end_offset) for the CSV records after `start_offset`.
+
+    `end_offset` is the byte offset just past the record, i.e. where a later
+    run should resume. Quoted fields spanning several lines are handled.
+    """
+    with open(path, "rb") as file:
+        header = next(csv.reader([file.readline().decode("utf-8-sig")]))
+        if start_offset > file.tell():
+            file.seek(start_offset)
+        position = [file.tell()]
+
+        def lines():
+            while True:
+                line = file.readline()
+                if not line:
+                    return
+                position[0] = file.tell()
+                yield line.decode("utf-8")
+
+        # csv.reader only pulls the lines of one record at a time
+        for values in csv.reader(lines()):
+            if values:
+                yield dict(zip(header, values)), position[0]
+
+
+def parse_records(records):
+    """Normalize raw CSV records; records without a parsable Date are dropped."""
+    for record, offset in records:
+        try:
+            date = datetime.datetime.fromisoformat(record["Date"].strip())
+        except (KeyError, ValueError):
+            continue
+        yield {
+            "company_name": normalize_company(record.get("company_name", "")),
+            "date": date.isoformat(),
+            "days_since_2000": (date.date() - EPOCH).days,
+            "document": _SPACES_RE.sub(" ", record.get("Document", "")).strip(),
+            "url": record.get("URL", "").strip(),
+        }, offset
+
+
+class SeenStories:
+    """SQLite record of ingested URLs and SimHashes, used to skip duplicates."""
+
+    def __init__(self, sqlite_path):
+        self.db = sqlite3.connect(sqlite_path)
+        self.db.execute("CREATE TABLE IF NOT EXISTS urls (url TEXT PRIMARY KEY)")
+        band_columns = ", ".join(f"band{band} INTEGER" for band in range(SIMHASH_BANDS))
+        self.db.execute(f"CREATE TABLE IF NOT EXISTS simhashes (hash TEXT NOT NULL, {band_columns})")
+        for band in range(SIMHASH_BANDS):
+            self.db.execute(f"CREATE INDEX IF NOT EXISTS simhashes_band{band} ON simhashes (band{band})")
+        self.db.commit()
+
+    def has_url(self, url):
+        return self.db.execute("SELECT 1 FROM urls WHERE url = ?", (url,)).fetchone() is not None
+
+    def has_near_duplicate(self, value):
+        for band, band_value in enumerate(simhash_bands(value)):
+            for (other,) in self.db.execute(f"SELECT hash FROM simhashes WHERE band{band} = ?", (band_value,)):
+                if bin(value ^ int(other, 16)).count("1") <= SIMHASH_MAX_DISTANCE:
+                    return True
+        return False
+
+    def add(self, url, value):
+        # Not committed until the batch is stored, see ingest_news_csv()
+        self.db.execute("INSERT OR IGNORE INTO urls (url) VALUES (?)", (url,))
+        self.db.execute(
+            f"INSERT INTO simhashes VALUES (?, {', '.join('?' * SIMHASH_BANDS)})",
+            (format(value, "016x"), *simhash_bands(value)),
+        )
+
+
+def deduplicate(rows, seen, stats):
+    """Drop rows whose URL was seen or whose text is a near duplicate of a seen one."""
+    for row, offset in rows:
+        stats["offset"] = offset
+        if row["url"] and seen.has_url(row["url"]):
+            stats["duplicate_urls"] += 1
+            continue
+        value = simhash(row["document"])
+        if seen.has_near_duplicate(value):
+            stats["near_duplicates"] += 1
+            continue
+        seen.add(row["url"], value)
+        yield row, offset
+
+
+# Function to group an iterable into lists of at most `size` items
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# Function to build a stable ChromaDB id for a story
+def story_id(row):
+    key = row["url"] or row["document"]
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+# Function to save where the next run should resume
+def save_state(state_path, source, offset):
+    with open(state_path + ".tmp", "w", encoding="utf-8") as file:
+        json.dump({"source": source, "offset": offset}, file)
+    os.replace(state_path + ".tmp", state_path)
+
+
+def ingest_news_csv(csv_path, collection, embedding_engine, state_dir, batch_size=256):
+    """Upsert the new, non-duplicate stories of `csv_path` into `collection`.
+
+    Returns counts of stored rows and skipped duplicates.
+    """
+    os.makedirs(state_dir, exist_ok=True)
+    state_path = os.path.join(state_dir, "news_ingest_state.json")
+    seen = SeenStories(os.path.join(state_dir, "news_seen.sqlite3"))
+
+    try:
+        with open(state_path, "r", encoding="utf-8") as file:
+            state = json.load(file)
+    except (OSError, ValueError):
+        state = {}
+    source = os.path.abspath(csv_path)
+    offset = state.get("offset", 0) if state.get("source") == source else 0
+    if offset > os.path.getsize(csv_path):
+        # The file was replaced rather than appended to: read it from the start
+        offset = 0
+
+    stats = {"stored": 0, "duplicate_urls": 0, "near_duplicates": 0, "offset": offset}
+    rows = deduplicate(parse_records(iter_csv_records(csv_path, offset)), seen, stats)
+    for batch in batched(rows, batch_size):
+        embeddings = embedding_engine.embed([row["document"] for row, _ in batch])
+        collection.upsert(
+            ids=[story_id(row) for row, _ in batch],
+            documents=[row["document"] for row, _ in batch],
+            metadatas=[
+                {key: row[key] for key in ("company_name", "date", "days_since_2000", "url")}
+                for row, _ in batch
+            ],
+            embeddings=embeddings,
+        )
+        # Only now remember the stories and move the offset past them
+        seen.db.commit()
+        save_state(state_path, source, batch[-1][1])
+        stats["stored"] += len(batch)
+
+    # Duplicates at the end of the file need no upsert, but the offset moves past them too
+    seen.db.commit()
+    seen.db.close()
+    save_state(state_path, source, stats["offset"])
+    return stats
+
+
+def main():
+    from embedding_engine import EmbeddingEngine
+    from shared_resources import CHROMA_DIRECTORY, get_collection, get_openai_client
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=NEWS_CSV_PATH)
+    parser.add_argument("--collection", default="NewsCollection")
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    collection = get_collection(args.collection, CHROMA_DIRECTORY)
+    engine = EmbeddingEngine(get_openai_client(os.environ.get("OPENAI_API_KEY")))
+    stats = ingest_news_csv(args.csv, collection, engine, CHROMA_DIRECTORY, args.batch_size)
+    print(f"{stats['stored']} stories stored, {stats['duplicate_urls']} duplicate URLs, "
+          f"{stats['near_duplicates']} near duplicates skipped")
+
+
+if __name__ == "__main__":
+    main()
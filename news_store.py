@@ -0,0 +1,200 @@
+import datetime
+import math
+import re
+import sys
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+
+NEWS_CSV_PATH = "News_Data/news_data.csv"
+
+# days_since_2000 counts days from this date
+EPOCH = datetime.date(2000, 1, 1)
+
+_TERM_RE = re.compile(r"\w+")
+
+# Question words that say nothing about which stories are relevant
+STOPWORDS = frozenset("""
+a about all an and any are as at be been but by can did do does for from had has have how i in is it its
+latest me new news of on or recent show so story stories tell than that the their them there these they
+this to was we were what when where which who why will with you your
+""".split())
+
+
+# Function to convert a date (or ISO string) into days since 2000-01-01
+def to_days(value):
+    if value is None or isinstance(value, (int, np.integer)):
+        return value
+    if isinstance(value, str):
+        value = datetime.date.fromisoformat(value[:10])
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    return (value - EPOCH).days
+
+
+# Function to clean up a company name ("Samsung Electronics\xa0" -> "Samsung Electronics")
+def normalize_company(name):
+    return " ".join(str(name).split())
+
+
+class NewsStore:
+    """Columnar, read-only store of news stories.
+
+    Rows are sorted by (company, day) so every company is a contiguous slice
+    and a date range inside it is found with two binary searches. Company
+    names are stored once as categories with an int32 code per row, days as
+    int32 and URLs as interned strings (repeated URLs share one object).
+    """
+
+    def __init__(self, companies, company_codes, days, dates, documents, urls, row_ids):
+        self.companies = companies
+        self.company_codes = company_codes
+        self.days = days
+        self.dates = dates
+        self.documents = documents
+        self.urls = urls
+        self.row_ids = row_ids
+        self._positions = None
+        self._term_positions = None
+        self._company_term_positions = None
+
+        self._company_lookup = {name.lower(): code for code, name in enumerate(companies)}
+        # company_bounds[code] .. company_bounds[code + 1] is the slice of that company
+        self.company_bounds = np.searchsorted(company_codes, np.arange(len(companies) + 1))
+
+    @classmethod
+    def from_csv(cls, path=NEWS_CSV_PATH):
+        frame = pd.read_csv(
+            path,
+            usecols=["company_name", "days_since_2000", "Date", "Document", "URL"],
+            dtype={"company_name": "string", "days_since_2000": "int32", "Document": "string", "URL": "string"},
+        )
+        return cls.from_frame(frame)
+
+    @classmethod
+    def from_frame(cls, frame):
+        names = frame["company_name"].fillna("").map(normalize_company).astype("category")
+        companies = list(names.cat.categories)
+        company_codes = names.cat.codes.to_numpy(dtype=np.int32)
+        days = frame["days_since_2000"].to_numpy(dtype=np.int32)
+
+        # Unparseable dates fall back to midnight of their day
+        dates = pd.to_datetime(frame["Date"], utc=True, errors="coerce").dt.tz_localize(None)
+        dates = dates.to_numpy(dtype="datetime64[s]")
+        missing = np.isnat(dates)
+        dates[missing] = np.datetime64(EPOCH, "s") + days[missing].astype("timedelta64[D]")
+
+        # Sort by company, then by day and time (lexsort uses the last key as primary)
+        order = np.lexsort((dates, days, company_codes))
+        documents = frame["Document"].fillna("").to_numpy(dtype=object)
+        urls = np.array([sys.intern(url) for url in frame["URL"].fillna("")], dtype=object)
+
+        return cls(
+            companies=companies,
+            company_codes=company_codes[order],
+            days=days[order],
+            dates=dates[order],
+            documents=documents[order],
+            urls=urls[order],
+            row_ids=order.astype(np.int64),
+        )
+
+    def __len__(self):
+        return len(self.days)
+
+    def company_slice(self, company):
+        """Return the (start, stop) rows of `company`, or of every row if None."""
+        if company is None:
+            return 0, len(self.days)
+        code = self._company_lookup.get(normalize_company(company).lower())
+        if code is None:
+            return 0, 0
+        return int(self.company_bounds[code]), int(self.company_bounds[code + 1])
+
+    def select(self, company=None, start=None, end=None):
+        """Return the positions of the rows of `company` between `start` and `end` (inclusive)."""
+        start, end = to_days(start), to_days(end)
+        lo, hi = self.company_slice(company)
+        if company is not None:
+            # Days are sorted inside a company slice
+            days = self.days[lo:hi]
+            first = np.searchsorted(days, start, side="left") if start is not None else 0
+            last = np.searchsorted(days, end, side="right") if end is not None else len(days)
+            return np.arange(lo + first, lo + last)
+
+        mask = np.ones(hi - lo, dtype=bool)
+        if start is not None:
+            mask &= self.days >= start
+        if end is not None:
+            mask &= self.days <= end
+        return np.flatnonzero(mask)
+
+    def top_stories(self, company=None, start=None, end=None, n=10, query=None):
+        """Return the positions of the top `n` stories, best first.
+
+        Without `query` the most recent stories win. With a query, stories
+        are ranked by the summed IDF of the query words (stopwords left out)
+        found among their words, counted once more when the word is in the
+        story's company name, then by recency; stories matching none of
+        them are left out.
+        """
+        positions = self.select(company, start, end)
+        if len(positions) == 0:
+            return positions
+
+        dates = self.dates[positions]
+        terms = self._query_terms(query) if query else []
+        if not terms:
+            order = np.argsort(dates, kind="stable")[::-1]
+            return positions[order[:n]]
+
+        scores = np.zeros(len(self.days))
+        for term in terms:
+            matches = self._term_positions.get(term, [])
+            company_matches = self._company_term_positions.get(term, [])
+            # Rare words count more than ones found in many stories
+            found = max(len(matches), len(company_matches))
+            idf = math.log(1 + (len(self.days) - found + 0.5) / (found + 0.5))
+            scores[matches] += idf
+            scores[company_matches] += idf
+        scores = scores[positions]
+        # Best score first, most recent first among equal scores
+        order = np.lexsort((-dates.astype(np.int64), -scores))
+        order = order[scores[order] > 0][:n]
+        return positions[order]
+
+    def _query_terms(self, query):
+        # Index the words of every story, and of its company name, on first use
+        if self._term_positions is None:
+            term_positions, company_term_positions = defaultdict(list), defaultdict(list)
+            for position, document in enumerate(self.documents):
+                for term in set(_TERM_RE.findall(document.lower())):
+                    term_positions[term].append(position)
+            for code, name in enumerate(self.companies):
+                rows = np.arange(self.company_bounds[code], self.company_bounds[code + 1])
+                for term in set(_TERM_RE.findall(name.lower())):
+                    company_term_positions[term].append(rows)
+            self._company_term_positions = {
+                term: np.concatenate(rows) for term, rows in company_term_positions.items()
+            }
+            self._term_positions = {term: np.array(found, dtype=np.int64) for term, found in term_positions.items()}
+        return sorted(term for term in set(_TERM_RE.findall(query.lower()))
+                      if term not in STOPWORDS and (term in self._term_positions or term in self._company_term_positions))
+
+    def positions_of(self, row_ids):
+        """Return the store positions of the given CSV row numbers."""
+        if self._positions is None:
+            self._positions = np.empty(len(self.row_ids), dtype=np.int64)
+            self._positions[self.row_ids] = np.arange(len(self.row_ids))
+        return self._positions[np.asarray(row_ids, dtype=np.int64)]
+
+    def story(self, position):
+        return {
+            "company_name": self.companies[self.company_codes[position]],
+            "days_since_2000": int(self.days[position]),
+            "Date": str(self.dates[position]),
+            "Document": self.documents[position],
+            "URL": self.urls[position],
+        }
@@ -0,0 +1,224 @@
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import types
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+
+from PyPDF2 import PdfReader
+
+# PyMuPDF is much faster than PyPDF2 but optional ("fitz" is its legacy name)
+try:
+    import pymupdf as fitz
+except ImportError:
+    try:
+        import fitz
+    except ImportError:
+        fitz = None
+
+
+# Large PDFs are split into tasks of this many pages
+PAGES_PER_TASK = 16
+
+# Pages to extract before worker processes pay off. Starting the pool costs
+# about a second; PyMuPDF reads a page in a few ms, PyPDF2 in tens of ms.
+POOL_MIN_PAGES = {"pymupdf": 500, "pypdf2": 60}
+
+# Serializes the temporary swap of __main__ while workers start
+_spawn_lock = threading.Lock()
+
+
+# Function to resolve the extraction backend to use
+def resolve_backend(backend="auto"):
+    if backend == "auto":
+        return "pymupdf" if fitz is not None else "pypdf2"
+    if backend == "pymupdf" and fitz is None:
+        raise ImportError("PyMuPDF is not installed; use backend='pypdf2'")
+    if backend not in ("pymupdf", "pypdf2"):
+        raise ValueError(f"Unknown PDF backend: {backend}")
+    return backend
+
+
+# Function to count the pages of a PDF
+def count_pages(filepath, backend):
+    if backend == "pymupdf":
+        with fitz.open(filepath) as document:
+            return document.page_count
+    with open(filepath, "rb") as file:
+        return len(PdfReader(file).pages)
+
+
+# Function to extract the text of pages [start, stop) of a PDF (runs in a worker process)
+def extract_page_range(filepath, start, stop, backend):
+    if backend == "pymupdf":
+        with fitz.open(filepath) as document:
+            return [document[i].get_text() or '' for i in range(start, stop)]
+    with open(filepath, "rb") as file:
+        pdf_reader = PdfReader(file)
+        return [pdf_reader.pages[i].extract_text() or '' for i in range(start, stop)]
+
+
+@contextmanager
+def _without_main_script():
+    """Hide the __main__ module while worker processes are started.
+
+    "spawn" workers re-run the parent's main script before doing any work,
+    and under `streamlit run` that is streamlit_app.py: every worker would
+    set up the page, render Lab1 and bind the metrics port. With an empty
+    __main__ the workers only import this module.
+    """
+    with _spawn_lock:
+        main_module = sys.modules.get("__main__")
+        placeholder = types.ModuleType("__main__")
+        sys.modules["__main__"] = placeholder
+        try:
+            yield
+        finally:
+            # Streamlit may have installed a new __main__ for a rerun meanwhile; keep it
+            if sys.modules.get("__main__") is placeholder:
+                sys.modules["__main__"] = main_module
+
+
+class PageTextCache:
+    """On-disk cache of extracted page texts, keyed by file content hash."""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, sha256, backend):
+        return os.path.join(self.cache_dir, f"{sha256}.{backend}.json")
+
+    def get(self, sha256, backend):
+        try:
+            with open(self._path(sha256, backend), "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, sha256, backend, pages):
+        path = self._path(sha256, backend)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(pages, file)
+        os.replace(tmp_path, path)
+
+    def discard(self, sha256):
+        if not sha256:
+            return
+        for backend in ("pymupdf", "pypdf2"):
+            try:
+                os.remove(self._path(sha256, backend))
+            except OSError:
+                pass
+
+
+def iter_extracted_pages(files, cache=None, backend="auto", max_workers=None,
+                         pages_per_task=PAGES_PER_TASK, pool_min_pages=None):
+    """Extract the page texts of `files`, a list of (filepath, sha256) pairs.
+
+    Cached files are served from `cache` without opening the PDF. The rest
+    are split into page ranges of `pages_per_task` pages. When there are at
+    least `pool_min_pages` pages to read (POOL_MIN_PAGES for the backend by
+    default), the ranges run on a process pool with one worker per core, so
+    one big PDF is spread over several cores too; smaller jobs, and ranges
+    left over by a broken pool, are extracted in this process. Yields
+    (filepath, pages, error) as soon as all pages of a file are done, in
+    completion order.
+    """
+    backend = resolve_backend(backend)
+
+    pending = []
+    for filepath, sha256 in files:
+        pages = cache.get(sha256, backend) if cache is not None and sha256 else None
+        if pages is not None:
+            yield filepath, pages, None
+        else:
+            pending.append((filepath, sha256))
+    if not pending:
+        return
+
+    # Plan the page ranges of every file
+    tasks, results = [], {}
+    for filepath, sha256 in pending:
+        try:
+            page_count = count_pages(filepath, backend)
+        except Exception as e:
+            yield filepath, None, e
+            continue
+        results[filepath] = {"sha256": sha256, "pages": [None] * page_count, "remaining": 0, "error": None}
+        for start in range(0, page_count, pages_per_task):
+            tasks.append((filepath, start, min(start + pages_per_task, page_count)))
+            results[filepath]["remaining"] += 1
+
+    # Function to record a finished range; returns the file's result once complete
+    def finish(filepath, start, pages, error):
+        result = results[filepath]
+        if error is not None:
+            result["error"] = error
+        else:
+            result["pages"][start:start + len(pages)] = pages
+        result["remaining"] -= 1
+        if result["remaining"] > 0:
+            return None
+        if result["error"] is None and cache is not None and result["sha256"]:
+            cache.put(result["sha256"], backend, result["pages"])
+        return filepath, None if result["error"] else result["pages"], result["error"]
+
+    # Empty PDFs have no tasks
+    for filepath, result in results.items():
+        if result["remaining"] == 0:
+            yield filepath, [], None
+
+    # Function to extract page ranges in this process
+    def extract_in_process(tasks):
+        for filepath, start, stop in tasks:
+            try:
+                done = finish(filepath, start, extract_page_range(filepath, start, stop, backend), None)
+            except Exception as e:
+                done = finish(filepath, start, None, e)
+            if done:
+                yield done
+
+    if pool_min_pages is None:
+        pool_min_pages = POOL_MIN_PAGES[backend]
+    if len(tasks) <= 1 or sum(stop - start for _, start, stop in tasks) < pool_min_pages:
+        # Not worth starting worker processes
+        yield from extract_in_process(tasks)
+        return
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(tasks))
+    # "spawn" avoids forking the multi-threaded Streamlit server process
+    context = multiprocessing.get_context("spawn")
+    handled = set()
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+            # Workers are started as tasks are submitted
+            with _without_main_script():
+                futures = {
+                    executor.submit(extract_page_range, filepath, start, stop, backend): (filepath, start)
+                    for filepath, start, stop in tasks
+                }
+            for future in as_completed(futures):
+                filepath, start = futures[future]
+                try:
+                    pages = future.result()
+                except BrokenProcessPool:
+                    # A worker died; the ranges it did not finish are redone below
+                    continue
+                except Exception as e:
+                    done = finish(filepath, start, None, e)
+                else:
+                    done = finish(filepath, start, pages, None)
+                handled.add((filepath, start))
+                if done:
+                    yield done
+    except (BrokenProcessPool, OSError):
+        # The pool could not start workers
+        pass
+
+    # Fall back to this process for whatever the pool did not extract
+    yield from extract_in_process([task for task in tasks if task[:2] not in handled])
@@ -0,0 +1,49 @@
+import re
+from array import array
+
+from sqlite_cache import SQLiteLRUCache
+
+
+_SPACES_RE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = " ?!.,;:"
+
+
+# Function to normalize a question so trivially different spellings share a cache entry
+def normalize_query(query):
+    return _SPACES_RE.sub(" ", query).strip().rstrip(_TRAILING_PUNCTUATION).lower()
+
+
+class QueryEmbeddingCache(SQLiteLRUCache):
+    """Cache of question embeddings (see sqlite_cache.SQLiteLRUCache).
+
+    Keys are (model, normalized question); embeddings are stored in SQLite
+    as float32 blobs.
+    """
+
+    TABLE = "query_embeddings"
+    KEY_COLUMNS = ("model", "query")
+    VALUE_COLUMN = "embedding"
+    VALUE_TYPE = "BLOB"
+
+    def __init__(self, max_entries=1024, sqlite_path=None):
+        super().__init__(max_entries, sqlite_path)
+
+    def encode(self, embedding):
+        return array("f", embedding).tobytes()
+
+    def decode(self, stored):
+        return array("f", stored).tolist()
+
+    def get(self, model, query):
+        return self.lookup((model, normalize_query(query)))
+
+    def put(self, model, query, embedding):
+        self.store((model, normalize_query(query)), embedding)
+
+    def get_or_compute(self, model, query, compute):
+        """Return the cached embedding of `query`, calling `compute(query)` on a miss."""
+        embedding = self.get(model, query)
+        if embedding is None:
+            embedding = compute(query)
+            self.put(model, query, embedding)
+        return embedding
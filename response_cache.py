@@ -0,0 +1,90 @@
+import hashlib
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+
+
+# Function to scale a vector to unit length so a dot product is the cosine similarity
+def normalize_vector(vector):
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+# Function to fingerprint the passages an answer was built from, by id and text
+def passages_fingerprint(passages):
+    digest = hashlib.sha256()
+    for chunk_id, text in sorted(passages):
+        digest.update(f"{chunk_id}\0{text}\0".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class SemanticResponseCache:
+    """Cache of chatbot answers for semantically equivalent questions.
+
+    An answer is reused when it was produced by the same `model` from the
+    same retrieved passages, given as (chunk_id, text) pairs so that a
+    chunk re-indexed with new text no longer matches, and its question
+    embedding has a cosine
+    similarity of at least `threshold` with the new one. Entries expire
+    after `ttl` seconds and the least recently used ones are evicted once
+    there are more than `max_entries`.
+    """
+
+    def __init__(self, threshold=0.95, ttl=3600, max_entries=512):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, query_embedding, passages, model):
+        """Return the cached answer for this question, or None."""
+        bucket = (model, passages_fingerprint(passages))
+        query_vector = normalize_vector(query_embedding)
+        now = time.monotonic()
+
+        with self._lock:
+            best_key, best_score = None, self.threshold
+            for key, entry in list(self._entries.items()):
+                if now - entry["created"] > self.ttl:
+                    del self._entries[key]
+                    continue
+                if entry["bucket"] != bucket:
+                    continue
+                score = sum(a * b for a, b in zip(query_vector, entry["vector"]))
+                if score >= best_score:
+                    best_key, best_score = key, score
+
+            if best_key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            return self._entries[best_key]["answer"]
+
+    def store(self, query_embedding, passages, model, answer):
+        with self._lock:
+            self._entries[self._next_id] = {
+                "bucket": (model, passages_fingerprint(passages)),
+                "vector": normalize_vector(query_embedding),
+                "answer": answer,
+                "created": time.monotonic(),
+            }
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+# Function to replay a cached answer in small pieces, like a streamed completion
+def replay_response(answer):
+    for piece in re.findall(r"\S+\s*|\s+", answer):
+        yield piece
@@ -0,0 +1,185 @@
+"""Process-wide resources shared by every Streamlit session.
+
+Streamlit runs each browser session in its own thread of one server
+process, so anything stored in `st.session_state` is built once per
+session. The objects here are built once per process instead and are safe
+to use from several sessions at the same time.
+"""
+import os
+import sys
+import threading
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+
+# Connection pool shared by all OpenAI calls of the process
+HTTP_MAX_CONNECTIONS = 32
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 16
+HTTP_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+
+# Where the Lab4 collection and its manifest live
+CHROMA_DIRECTORY = os.path.join(os.getcwd(), "chroma_db")
+
+# "openai" for the real APIs, or "stub" to serve OpenAI and OpenWeatherMap
+# requests from stub_server.py inside this process (any API key works)
+BACKEND = os.environ.get("DOCQA_BACKEND", "openai")
+STUB_LATENCY = float(os.environ.get("DOCQA_STUB_LATENCY", "0"))
+STUB_TOKENS_PER_SECOND = float(os.environ.get("DOCQA_STUB_TOKENS_PER_SECOND", "0"))
+
+# Process-wide limits of the LLM gateway (requests per minute 0 = unpaced)
+LLM_MAX_CONCURRENCY = int(os.environ.get("DOCQA_LLM_MAX_CONCURRENCY", "16"))
+LLM_REQUESTS_PER_MINUTE = int(os.environ.get("DOCQA_LLM_REQUESTS_PER_MINUTE", "500"))
+
+_lock = threading.Lock()
+_stub_lock = threading.Lock()
+_stub_url = None
+_openai_clients = {}
+_async_openai_clients = {}
+_chroma_clients = {}
+_collections = {}
+_weather_clients = {}
+_summary_cache = None
+_llm_gateways = {}
+
+# One background ingestion worker per (collection, PDF directory); workers are
+# built under their own lock because building one takes the lock above
+_ingestion_lock = threading.Lock()
+_ingestion_workers = {}
+
+
+# Function to get the URL of the in-process stub server, starting it on first use
+def get_stub_url():
+    global _stub_url
+    with _stub_lock:
+        if _stub_url is None:
+            from stub_server import start_background_server
+
+            _, _stub_url = start_background_server(
+                latency=STUB_LATENCY, tokens_per_second=STUB_TOKENS_PER_SECOND
+            )
+        return _stub_url
+
+
+# Function to get the base URL for OpenAI requests (None means the client's default)
+def get_openai_base_url():
+    return f"{get_stub_url()}/v1" if BACKEND == "stub" else None
+
+
+# Function to get the OpenAI client shared by the process (one per API key)
+def get_openai_client(api_key):
+    base_url = get_openai_base_url()
+    with _lock:
+        client = _openai_clients.get(api_key)
+        if client is None:
+            http_client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                ),
+                timeout=HTTP_TIMEOUT,
+            )
+            client = OpenAI(api_key=api_key, base_url=base_url, http_client=http_client)
+            _openai_clients[api_key] = client
+        return client
+
+
+# Function to get the async OpenAI client shared by the process (use it on async_bridge's loop only)
+def get_async_openai_client(api_key):
+    base_url = get_openai_base_url()
+    with _lock:
+        client = _async_openai_clients.get(api_key)
+        if client is None:
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                ),
+                timeout=HTTP_TIMEOUT,
+            )
+            client = AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=http_client)
+            _async_openai_clients[api_key] = client
+        return client
+
+
+# Function to get the LLM gateway shared by the process (one per API key); see llm_gateway.py
+def get_llm_gateway(api_key):
+    from llm_gateway import LLMGateway
+
+    client = get_async_openai_client(api_key)
+    with _lock:
+        gateway = _llm_gateways.get(api_key)
+        if gateway is None:
+            gateway = LLMGateway(
+                client, max_concurrency=LLM_MAX_CONCURRENCY, requests_per_minute=LLM_REQUESTS_PER_MINUTE
+            )
+            _llm_gateways[api_key] = gateway
+        return gateway
+
+
+# Function to get the weather client (and its cache) shared by the process
+def get_weather_client(api_key):
+    from weather_client import OPENWEATHER_URL, WeatherClient
+
+    url = f"{get_stub_url()}/data/2.5/weather" if BACKEND == "stub" else OPENWEATHER_URL
+    with _lock:
+        client = _weather_clients.get(api_key)
+        if client is None:
+            client = WeatherClient(api_key, url=url)
+            _weather_clients[api_key] = client
+        return client
+
+
+# Function to get the document summary cache shared by the process (Lab1-Lab3)
+def get_summary_cache():
+    global _summary_cache
+    from summary_cache import SummaryCache
+
+    with _lock:
+        if _summary_cache is None:
+            _summary_cache = SummaryCache(sqlite_path=os.path.join(CHROMA_DIRECTORY, "summaries.sqlite3"))
+        return _summary_cache
+
+
+# Function to import chromadb (only when a page actually needs it)
+def import_chromadb():
+    if "chromadb" not in sys.modules:
+        # Workaround for sqlite3 issue in Streamlit Cloud
+        try:
+            __import__('pysqlite3')
+            sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
+        except ImportError:
+            pass
+    import chromadb
+    return chromadb
+
+
+# Function to get the ChromaDB collection shared by the process
+def get_collection(name="Lab4Collection", persist_directory=CHROMA_DIRECTORY):
+    with _lock:
+        key = (persist_directory, name)
+        collection = _collections.get(key)
+        if collection is None:
+            client = _chroma_clients.get(persist_directory)
+            if client is None:
+                client = import_chromadb().PersistentClient(path=persist_directory)
+                _chroma_clients[persist_directory] = client
+            collection = client.get_or_create_collection(name)
+            _collections[key] = collection
+        return collection
+
+
+def get_ingestion_worker(collection, pdf_dir, create_worker):
+    """Return the running ingestion worker for this collection and directory.
+
+    The first caller builds it with `create_worker()` and starts it; every
+    later session of the process gets the same worker, so indexing runs once
+    in the background instead of blocking page loads.
+    """
+    key = (collection.name, os.path.abspath(pdf_dir))
+    with _ingestion_lock:
+        worker = _ingestion_workers.get(key)
+        if worker is None:
+            worker = create_worker().start()
+            _ingestion_workers[key] = worker
+        return worker
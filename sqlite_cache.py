@@ -0,0 +1,94 @@
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+class SQLiteLRUCache:
+    """In-memory LRU in front of an optional SQLite table.
+
+    Lookups go to an in-memory LRU of at most `max_entries` entries first
+    and then, if `sqlite_path` is given, to a SQLite table shared by every
+    process and session using the same file (and surviving restarts).
+    Subclasses name the table and its columns and turn their arguments
+    into a key tuple; `encode`/`decode` convert values to and from what is
+    stored in `VALUE_COLUMN`. `hits`, `disk_hits` and `misses` count lookups.
+    """
+
+    TABLE = None
+    KEY_COLUMNS = ()
+    VALUE_COLUMN = "value"
+    VALUE_TYPE = "TEXT"
+
+    def __init__(self, max_entries, sqlite_path=None):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._db = None
+        if sqlite_path:
+            os.makedirs(os.path.dirname(os.path.abspath(sqlite_path)), exist_ok=True)
+            self._db = sqlite3.connect(sqlite_path, check_same_thread=False, timeout=5)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            columns = ", ".join(f"{column} TEXT NOT NULL" for column in self.KEY_COLUMNS)
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.TABLE} ("
+                f"{columns}, {self.VALUE_COLUMN} {self.VALUE_TYPE} NOT NULL, "
+                f"PRIMARY KEY ({', '.join(self.KEY_COLUMNS)}))"
+            )
+            self._db.commit()
+
+    def encode(self, value):
+        return value
+
+    def decode(self, stored):
+        return stored
+
+    def lookup(self, key):
+        """Return the value cached under the `key` tuple, or None."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+            if self._db is not None:
+                where = " AND ".join(f"{column} = ?" for column in self.KEY_COLUMNS)
+                row = self._db.execute(
+                    f"SELECT {self.VALUE_COLUMN} FROM {self.TABLE} WHERE {where}", key
+                ).fetchone()
+                if row is not None:
+                    value = self.decode(row[0])
+                    self._remember(key, value)
+                    self.disk_hits += 1
+                    return value
+
+            self.misses += 1
+            return None
+
+    def store(self, key, value):
+        with self._lock:
+            self._remember(key, value)
+            if self._db is not None:
+                columns = (*self.KEY_COLUMNS, self.VALUE_COLUMN)
+                self._db.execute(
+                    f"INSERT OR REPLACE INTO {self.TABLE} ({', '.join(columns)}) "
+                    f"VALUES ({', '.join('?' for _ in columns)})",
+                    (*key, self.encode(value)),
+                )
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                    "entries": len(self._entries)}
+
+    def _remember(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
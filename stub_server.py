@@ -0,0 +1,275 @@
+"""Local stand-in for the OpenAI (embeddings, chat) and OpenWeatherMap APIs, for offline testing.
+
+Run it and point the clients at it:
+
+    $ python stub_server.py --port 8765
+    $ OPENAI_BASE_URL=http://127.0.0.1:8765/v1 \
+      OPENWEATHER_URL=http://127.0.0.1:8765/data/2.5/weather streamlit run streamlit_app.py
+
+or let shared_resources start one inside the app process:
+
+    $ DOCQA_BACKEND=stub streamlit run streamlit_app.py
+
+Embeddings are deterministic: every word is hashed into a fixed bucket, so
+texts that share words get similar vectors and retrieval still behaves
+sensibly without any network access. Weather is derived from a hash of the
+location, so repeated lookups return the same values. Chat completions
+answer with words taken from the prompt, streamed at `--tokens-per-second`;
+when tools are offered, the first tool is called once per place named in
+the question ("... in Syracuse; Boston?").
+"""
+import argparse
+import base64
+import hashlib
+import json
+import math
+import re
+import struct
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+EMBEDDING_DIMENSIONS = 1536
+# Length of a chat answer, in words (one streamed chunk each)
+REPLY_WORDS = 80
+
+_WORD_RE = re.compile(r"\w+")
+_PLACES_RE = re.compile(r"\bin\s+([^?]+)")
+
+
+# Function to build a deterministic, L2-normalized embedding for a text
+def stub_embedding(text, dimensions=EMBEDDING_DIMENSIONS):
+    vector = [0.0] * dimensions
+    for word in _WORD_RE.findall(text.lower()):
+        digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+        bucket = int.from_bytes(digest[:4], "little") % dimensions
+        sign = 1.0 if digest[4] & 1 else -1.0
+        vector[bucket] += sign
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+# Function to build a deterministic OpenWeatherMap-style response for a location
+def stub_weather(location):
+    seed = hashlib.blake2b(location.lower().encode("utf-8"), digest_size=8).digest()
+    temperature = -10 + seed[0] % 45 + seed[1] / 256
+    return {
+        "name": location.split(",")[0].strip().title() or "Unknown",
+        "main": {
+            "temp": temperature,
+            "feels_like": temperature - seed[2] % 5,
+            "temp_min": temperature - 2,
+            "temp_max": temperature + 3,
+            "humidity": 20 + seed[3] % 80,
+        },
+        "weather": [{"description": ["clear sky", "few clouds", "light rain", "overcast clouds", "snow"][seed[4] % 5]}],
+    }
+
+
+# Function to build a deterministic chat answer from the last user message
+def stub_reply(messages, words=REPLY_WORDS):
+    prompt = next((str(m.get("content") or "") for m in reversed(messages) if m.get("role") == "user"), "")
+    vocabulary = _WORD_RE.findall(prompt) or ["stub"]
+    seed = int.from_bytes(hashlib.blake2b(prompt.encode("utf-8"), digest_size=4).digest(), "little")
+    return " ".join(vocabulary[(seed + i * 7) % len(vocabulary)] for i in range(words)) + "."
+
+
+# Function to build tool calls for the first offered tool, one per place in the question
+def stub_tool_calls(messages, tools):
+    prompt = next((str(m.get("content") or "") for m in reversed(messages) if m.get("role") == "user"), "")
+    match = _PLACES_RE.search(prompt)
+    places = [place.strip() for place in match.group(1).split(";")] if match else [""]
+    name = tools[0]["function"]["name"]
+    return [
+        {"id": f"call_{uuid.uuid4().hex[:12]}", "type": "function",
+         "function": {"name": name, "arguments": json.dumps({"location": place})}}
+        for place in places if place
+    ]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Set by make_server()
+    latency = 0.0
+    fail_every = 0
+    tokens_per_second = 0.0
+    _counter = 0
+    _counter_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _should_fail(self):
+        # Simulate rate limiting on every `fail_every`-th request
+        if not self.fail_every:
+            return False
+        with StubHandler._counter_lock:
+            StubHandler._counter += 1
+            return StubHandler._counter % self.fail_every == 0
+
+    def do_GET(self):
+        if self.latency:
+            time.sleep(self.latency)
+        if self._should_fail():
+            self._send_json(429, {"cod": 429, "message": "Rate limit reached (stub)"}, headers={"Retry-After": "0.1"})
+            return
+
+        url = urlparse(self.path)
+        if url.path.rstrip("/").endswith("/weather"):
+            location = parse_qs(url.query).get("q", [""])[0]
+            if not location.strip():
+                self._send_json(400, {"cod": "400", "message": "Nothing to geocode"})
+            else:
+                self._send_json(200, stub_weather(location))
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def do_POST(self):
+        if self.latency:
+            time.sleep(self.latency)
+        if self._should_fail():
+            self._send_json(429, {"error": {"message": "Rate limit reached (stub)", "type": "rate_limit_error"}},
+                            headers={"Retry-After": "0.1"})
+            return
+
+        path = self.path.rstrip("/")
+        if path.endswith("/embeddings"):
+            self._handle_embeddings(self._read_json())
+        elif path.endswith("/chat/completions"):
+            self._handle_chat(self._read_json())
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def _handle_embeddings(self, request):
+        inputs = request.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        dimensions = request.get("dimensions") or EMBEDDING_DIMENSIONS
+        use_base64 = request.get("encoding_format") == "base64"
+
+        data, tokens = [], 0
+        for index, text in enumerate(inputs):
+            vector = stub_embedding(str(text), dimensions)
+            tokens += len(_WORD_RE.findall(str(text)))
+            if use_base64:
+                vector = base64.b64encode(struct.pack(f"<{len(vector)}f", *vector)).decode("ascii")
+            data.append({"object": "embedding", "index": index, "embedding": vector})
+
+        self._send_json(200, {
+            "object": "list",
+            "data": data,
+            "model": request.get("model", "stub"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        })
+
+    def _handle_chat(self, request):
+        messages = request.get("messages", [])
+        model = request.get("model", "stub")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        prompt_tokens = sum(len(_WORD_RE.findall(str(m.get("content") or ""))) for m in messages)
+
+        tools = request.get("tools")
+        if tools and not any(m.get("role") == "tool" for m in messages):
+            tool_calls = stub_tool_calls(messages, tools)
+            if tool_calls:
+                self._send_json(200, {
+                    "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                    "choices": [{"index": 0, "finish_reason": "tool_calls",
+                                 "message": {"role": "assistant", "content": None, "tool_calls": tool_calls}}],
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 10,
+                              "total_tokens": prompt_tokens + 10},
+                })
+                return
+
+        words = REPLY_WORDS
+        if request.get("max_tokens"):
+            words = max(1, min(words, int(request["max_tokens"])))
+        reply = stub_reply(messages, words)
+
+        if not request.get("stream"):
+            completion_tokens = len(reply.split())
+            self._send_json(200, {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": reply}}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            })
+            return
+
+        # Server-sent events, one word per chunk, paced at tokens_per_second
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        interval = 1.0 / self.tokens_per_second if self.tokens_per_second else 0.0
+        pieces = re.findall(r"\S+\s*", reply)
+        for index, piece in enumerate([{"role": "assistant", "content": ""}] + [{"content": p} for p in pieces]):
+            if interval and index:
+                time.sleep(interval)
+            self._send_event({"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                              "model": model, "choices": [{"index": 0, "delta": piece, "finish_reason": None}]})
+        self._send_event({"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                          "model": model, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _send_event(self, payload):
+        self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+
+# Function to create (but not start) a stub server
+def make_server(host="127.0.0.1", port=8765, latency=0.0, fail_every=0, tokens_per_second=0.0):
+    handler = type("ConfiguredStubHandler", (StubHandler,), {
+        "latency": latency, "fail_every": fail_every, "tokens_per_second": tokens_per_second,
+    })
+    return ThreadingHTTPServer((host, port), handler)
+
+
+# Function to start a stub server on a free port in a daemon thread; returns (server, base URL)
+def start_background_server(latency=0.0, fail_every=0, tokens_per_second=0.0):
+    server = make_server("127.0.0.1", 0, latency, fail_every, tokens_per_second)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="stub-server", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--fail-every", type=int, default=0, help="answer every Nth request with a 429")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0,
+                        help="pace of streamed chat answers (0 = as fast as possible)")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.latency, args.fail_every, args.tokens_per_second)
+    print(f"Stub OpenAI API on http://{args.host}:{args.port}/v1, "
+          f"weather on http://{args.host}:{args.port}/data/2.5/weather")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Map-reduce summarization of documents larger than one prompt.
+
+Short documents go to the model in one piece, as before. Longer ones are
+split into token windows that are condensed in parallel (map); the notes are
+then merged in groups that fit one prompt until a single set remains
+(reduce). The caller streams the final, formatted answer from the messages
+returned by `prepare_summary_messages`.
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from chunking import chunk_pages, get_encoding
+
+
+# Documents up to this many tokens are sent whole
+DIRECT_SUMMARY_TOKENS = 6000
+# Size of each map chunk, and of each group of notes merged in one reduce call
+MAP_CHUNK_TOKENS = 3000
+MAP_OVERLAP_TOKENS = 100
+REDUCE_GROUP_TOKENS = 6000
+# Output length of each intermediate call
+NOTES_MAX_TOKENS = 400
+# Concurrent chat completions per summary
+MAX_CONCURRENCY = 8
+
+MAP_PROMPT = (
+    "Write dense notes on this section of a longer document. Keep the key facts, "
+    "names, numbers and conclusions; skip filler. Section:\n\n{text}"
+)
+REDUCE_PROMPT = (
+    "These are notes on consecutive sections of one document. Merge them into one set "
+    "of dense notes, keeping the key facts, names, numbers and conclusions.\n\n{text}"
+)
+
+
+# Function to count the tokens of a text
+def count_tokens(text):
+    return len(get_encoding().encode(text))
+
+
+# Function to condense one piece of text with a single (non-streamed) completion
+def _condense(gateway, model, prompt, text):
+    return gateway.complete_sync(
+        model=model,
+        messages=[{"role": "user", "content": prompt.format(text=text)}],
+        max_tokens=NOTES_MAX_TOKENS,
+    ).strip()
+
+
+# Function to condense many texts concurrently, keeping their order
+def _condense_all(gateway, model, prompt, texts, max_workers, on_step):
+    results = [None] * len(texts)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(_condense, gateway, model, prompt, text): i for i, text in enumerate(texts)}
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+            on_step()
+    return results
+
+
+# Function to pack consecutive notes into groups that fit one reduce prompt
+def _group_notes(notes, group_tokens):
+    groups, current, current_tokens = [], [], 0
+    for note in notes:
+        tokens = count_tokens(note)
+        if current and current_tokens + tokens > group_tokens:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(note)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def summarize_to_notes(gateway, model, document, max_workers=MAX_CONCURRENCY, on_progress=None):
+    """Reduce `document` to text that fits in one prompt, using an llm_gateway.LLMGateway.
+
+    Returns the document itself when it is short enough. `on_progress` is
+    called as `on_progress(done, total, stage)` from the calling thread after
+    every completed call, so it can update Streamlit elements.
+    """
+    if count_tokens(document) <= DIRECT_SUMMARY_TOKENS:
+        return document
+
+    chunks = [chunk["text"] for chunk in chunk_pages([document], MAP_CHUNK_TOKENS, MAP_OVERLAP_TOKENS)]
+    # Each reduce level merges many notes per call, so this is a safe estimate
+    total = 2 * len(chunks)
+    done = 0
+
+    def step(stage):
+        def advance():
+            nonlocal done
+            done = min(done + 1, total)
+            if on_progress is not None:
+                on_progress(done, total, stage)
+        return advance
+
+    notes = _condense_all(gateway, model, MAP_PROMPT, chunks, max_workers, step("map"))
+    while sum(count_tokens(note) for note in notes) > DIRECT_SUMMARY_TOKENS:
+        groups = _group_notes(notes, REDUCE_GROUP_TOKENS)
+        if len(groups) == len(notes):
+            # Nothing can be merged any more; send what fits
+            break
+        notes = _condense_all(gateway, model, REDUCE_PROMPT, ["\n\n".join(group) for group in groups],
+                              max_workers, step("reduce"))
+
+    if on_progress is not None:
+        on_progress(total, total, "done")
+    return "\n\n".join(notes)
+
+
+def prepare_summary_messages(gateway, model, document, instruction, question=None,
+                             max_workers=MAX_CONCURRENCY, on_progress=None):
+    """Return the chat messages for the final summary of `document`.
+
+    `instruction` is the chosen format ("Summarize ... in 5 bullet points");
+    `question`, if given, is appended the way the labs always did.
+    """
+    notes = summarize_to_notes(gateway, model, document, max_workers, on_progress)
+    instruction = instruction.rstrip(". ")
+    if notes is document:
+        content = f"{instruction}: {document}"
+    else:
+        content = f"{instruction}. The document was too long to include, so here are notes covering all of it: {notes}"
+    if question:
+        content = f"{content} \n\n---\n\n {question}"
+    return [{"role": "user", "content": content}]
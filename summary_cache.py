@@ -0,0 +1,29 @@
+import hashlib
+
+from sqlite_cache import SQLiteLRUCache
+
+
+# Function to fingerprint an uploaded document by its bytes
+def document_sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class SummaryCache(SQLiteLRUCache):
+    """Cache of finished document summaries (see sqlite_cache.SQLiteLRUCache).
+
+    Keys are (document SHA-256, summary option, model); the option should
+    include anything else that shapes the answer, such as the question.
+    """
+
+    TABLE = "summaries"
+    KEY_COLUMNS = ("document_sha256", "option", "model")
+    VALUE_COLUMN = "summary"
+
+    def __init__(self, max_entries=256, sqlite_path=None):
+        super().__init__(max_entries, sqlite_path)
+
+    def get(self, document_sha, option, model):
+        return self.lookup((document_sha, option, model))
+
+    def put(self, document_sha, option, model, summary):
+        self.store((document_sha, option, model), summary)
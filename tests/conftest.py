@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+# The app modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chunking
+
+
+class ByteEncoding:
+    """Offline stand-in for the tiktoken encoding: one token per UTF-8 byte."""
+
+    def encode(self, text):
+        return list(text.encode("utf-8"))
+
+    def decode(self, tokens):
+        return bytes(tokens).decode("utf-8", errors="ignore")
+
+
+# Fixture: token counting without downloading the tiktoken data
+@pytest.fixture
+def byte_encoding(monkeypatch):
+    encoding = ByteEncoding()
+    monkeypatch.setattr(chunking, "_encoding", encoding)
+    return encoding
@@ -0,0 +1,58 @@
+from context_builder import PASSAGE_SEPARATOR, build_context
+
+
+def test_keeps_lines_that_only_occur_inside_earlier_text(byte_encoding):
+    context, used_ids, _ = build_context([
+        ("a", "Week 10: Final project...\nGrading: exams 40%"),
+        ("b", "Week 1\nExam\nIntro..."),
+    ])
+    assert context.split("\n") == [
+        "Week 10: Final project...", "Grading: exams 40%", "", "Week 1", "Exam", "Intro...",
+    ]
+    assert used_ids == ["a", "b"]
+
+
+def test_drops_sentences_repeated_by_overlapping_chunks(byte_encoding):
+    context, used_ids, _ = build_context([
+        ("a", "The course covers SQL. Projects are graded weekly."),
+        ("b", "projects are  graded weekly. The final exam is in May."),
+    ])
+    assert context == "The course covers SQL.\nProjects are graded weekly." + PASSAGE_SEPARATOR + "The final exam is in May."
+    assert used_ids == ["a", "b"]
+
+
+def test_skips_passages_with_nothing_new(byte_encoding):
+    _, used_ids, _ = build_context([("a", "Same text."), ("b", "Same text.")])
+    assert used_ids == ["a"]
+
+
+def test_stops_at_a_sentence_boundary_within_the_budget(byte_encoding):
+    passages = [("a", "First sentence here. Second sentence here."), ("b", "Another passage.")]
+    context, used_ids, tokens = build_context(passages, budget_tokens=30)
+    assert context == "First sentence here."
+    assert used_ids == ["a"]
+    assert tokens <= 30
+
+
+def test_empty_input(byte_encoding):
+    assert build_context([]) == ("", [], 0)
+
+
+def test_drops_the_cut_off_sentence_at_the_start_of_an_overlapping_chunk(byte_encoding):
+    context, used_ids, _ = build_context([
+        ("a", "Welcome to the IST 652 Syllabus. Grading is based on two exams."),
+        ("b", "abus. Grading is based on two exams. Office hours are on Monday."),
+    ])
+    assert context == ("Welcome to the IST 652 Syllabus.\nGrading is based on two exams."
+                       + PASSAGE_SEPARATOR + "Office hours are on Monday.")
+    assert used_ids == ["a", "b"]
+
+
+def test_keeps_the_whole_sentence_when_a_chunk_ends_mid_sentence(byte_encoding):
+    context, used_ids, _ = build_context([
+        ("a", "Welcome to the IST 652 Syllabus. Grading is based on two ex"),
+        ("b", "Syllabus. Grading is based on two exams. Office hours are on Monday."),
+    ])
+    assert context == ("Welcome to the IST 652 Syllabus." + PASSAGE_SEPARATOR
+                       + "Grading is based on two exams.\nOffice hours are on Monday.")
+    assert used_ids == ["a", "b"]
@@ -0,0 +1,55 @@
+import threading
+
+from conversation_memory import ConversationMemory
+
+
+class BlockingGateway:
+    """Gateway stand-in whose summaries wait until `release` is set."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.requests = []
+
+    def complete_sync(self, **request):
+        self.requests.append(request)
+        self.release.wait(5)
+        return "They talked about exams."
+
+
+# Function to add `count` turns of 14 bytes (18 tokens with the per-turn overhead)
+def add_turns(memory, count, start=0):
+    for i in range(start, start + count):
+        memory.add("user" if i % 2 == 0 else "assistant", f"message no. {i:02d}")
+
+
+def test_summarizes_before_the_budget_is_full(byte_encoding):
+    gateway = BlockingGateway()
+    memory = ConversationMemory(gateway, budget_tokens=100)
+    add_turns(memory, 4)
+    memory.context_messages()
+    assert gateway.requests == []
+
+    # 90 of 100 tokens: over the 75% mark, so the oldest turn is summarized already
+    add_turns(memory, 1, start=4)
+    memory.context_messages()
+    gateway.release.set()
+    memory._pending.result()
+    assert gateway.requests
+    assert memory.summarized == 1
+
+
+def test_turns_stay_in_the_prompt_until_their_summary_lands(byte_encoding):
+    gateway = BlockingGateway()
+    memory = ConversationMemory(gateway, budget_tokens=100)
+    add_turns(memory, 8)
+
+    # The summary is still running: nothing is left out
+    messages = memory.context_messages()
+    assert [message["content"] for message in messages] == [f"message no. {i:02d}" for i in range(8)]
+
+    gateway.release.set()
+    memory._pending.result()
+    messages = memory.context_messages()
+    assert messages[0] == {"role": "system", "content": "Summary of the earlier conversation: They talked about exams."}
+    assert [message["content"] for message in messages[1:]] == [f"message no. {i:02d}" for i in range(memory.summarized, 8)]
+    assert memory.summarized > 0
@@ -0,0 +1,62 @@
+import pytest
+from openai import OpenAI
+
+from embedding_engine import EmbeddingEngine
+from stub_server import start_background_server, stub_embedding
+
+
+# Function to start a stub server and return an OpenAI client pointed at it
+def stub_client(**server_options):
+    server, url = start_background_server(**server_options)
+    return server, OpenAI(api_key="test-key", base_url=url + "/v1")
+
+
+@pytest.fixture
+def client():
+    server, client = stub_client()
+    yield client
+    server.shutdown()
+
+
+def test_batches_are_bounded_by_inputs_and_tokens(client, byte_encoding):
+    engine = EmbeddingEngine(client, max_batch_inputs=3, max_batch_tokens=10)
+    batches = engine.make_batches(["aaaa", "bbbb", "cc", "d", "e", "ffffffffffff"])
+    assert [[index for index, _ in batch] for batch in batches] == [[0, 1, 2], [3, 4], [5]]
+
+
+def test_empty_texts_are_sent_as_a_space(client, byte_encoding):
+    engine = EmbeddingEngine(client)
+    assert engine.make_batches(["", None]) == [[(0, " "), (1, " ")]]
+
+
+def test_embeddings_come_back_in_input_order(client, byte_encoding):
+    texts = [f"passage number {i} about topic {i % 3}" for i in range(20)]
+    engine = EmbeddingEngine(client, max_batch_inputs=4, max_workers=3)
+    embeddings = engine.embed(texts)
+    assert engine.requests == 5
+    for text, embedding in zip(texts, embeddings):
+        assert embedding == pytest.approx(stub_embedding(text))
+
+
+def test_rate_limited_requests_are_retried_by_the_engine_only(byte_encoding):
+    # Every second request gets a 429
+    server, client = stub_client(fail_every=2)
+    try:
+        engine = EmbeddingEngine(client, max_batch_inputs=1, max_workers=1, base_delay=0.01)
+        assert len(engine.embed(["one", "two", "three"])) == 3
+        # No client-level retries hide the 429s: each one is an engine retry
+        assert engine.retries >= 1
+        assert engine.requests == 3 + engine.retries
+    finally:
+        server.shutdown()
+
+
+def test_gives_up_after_max_retries(byte_encoding):
+    server, client = stub_client(fail_every=1)
+    try:
+        engine = EmbeddingEngine(client, max_retries=2, base_delay=0.01)
+        with pytest.raises(Exception):
+            engine.embed(["text"])
+        assert (engine.requests, engine.retries) == (3, 2)
+    finally:
+        server.shutdown()
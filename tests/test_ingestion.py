@@ -0,0 +1,108 @@
+import os
+import shutil
+import uuid
+
+import chromadb
+import pytest
+
+from ingestion import load_manifest, plan_ingestion, save_manifest, sync_collection
+from stub_server import stub_embedding
+
+PDF_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Lab4_datafiles")
+SAMPLE_PDFS = ["IST 644 Syllabus.pdf", "IST 782 Syllabus.pdf"]
+
+
+class CountingEngine:
+    """Embedding engine stand-in that records how many texts it embedded."""
+
+    model = "stub-embedding"
+
+    def __init__(self):
+        self.embedded = 0
+
+    def embed(self, texts):
+        self.embedded += len(texts)
+        return [stub_embedding(text, 16) for text in texts]
+
+
+# Function to write a file and give it a fixed modification time
+def write_file(path, content, mtime):
+    with open(path, "wb") as file:
+        file.write(content)
+    os.utime(path, (mtime, mtime))
+
+
+# Function to record the planned changes as if they had been indexed
+def record(manifest, changed):
+    for filename, entry in changed:
+        manifest["files"][filename] = entry
+
+
+def test_plan_skips_unchanged_and_touched_files(tmp_path):
+    write_file(tmp_path / "a.pdf", b"first", 1000)
+    write_file(tmp_path / "b.pdf", b"second", 1000)
+    write_file(tmp_path / "notes.txt", b"ignored", 1000)
+    manifest = {"files": {}}
+
+    changed, unchanged, removed = plan_ingestion(tmp_path, manifest)
+    assert [filename for filename, _ in changed] == ["a.pdf", "b.pdf"]
+    assert (unchanged, removed) == ([], [])
+    record(manifest, changed)
+
+    # Same content with a new timestamp is not re-embedded, but the entry is refreshed
+    os.utime(tmp_path / "a.pdf", (2000, 2000))
+    changed, unchanged, removed = plan_ingestion(tmp_path, manifest)
+    assert (changed, unchanged, removed) == ([], ["a.pdf", "b.pdf"], [])
+    assert manifest["files"]["a.pdf"]["mtime"] == 2000
+
+
+def test_plan_reembeds_modified_files_and_drops_deleted_ones(tmp_path):
+    write_file(tmp_path / "a.pdf", b"first", 1000)
+    write_file(tmp_path / "b.pdf", b"second", 1000)
+    manifest = {"files": {}}
+    record(manifest, plan_ingestion(tmp_path, manifest)[0])
+
+    write_file(tmp_path / "a.pdf", b"first, edited", 3000)
+    os.remove(tmp_path / "b.pdf")
+    changed, unchanged, removed = plan_ingestion(tmp_path, manifest)
+    assert [filename for filename, _ in changed] == ["a.pdf"]
+    assert changed[0][1]["sha256"] != manifest["files"]["a.pdf"]["sha256"]
+    assert (unchanged, removed) == ([], ["b.pdf"])
+
+
+def test_manifest_round_trip(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    assert load_manifest(path) == {"files": {}}
+    save_manifest(path, {"files": {"a.pdf": {"size": 1}}})
+    assert load_manifest(path) == {"files": {"a.pdf": {"size": 1}}}
+    assert not os.path.exists(path + ".tmp")
+
+
+@pytest.mark.skipif(not all(os.path.exists(os.path.join(PDF_DIR, name)) for name in SAMPLE_PDFS),
+                    reason="sample syllabi not available")
+def test_sync_skips_reembeds_and_deletes(tmp_path, byte_encoding):
+    pdf_dir = tmp_path / "pdfs"
+    pdf_dir.mkdir()
+    for name in SAMPLE_PDFS:
+        shutil.copy(os.path.join(PDF_DIR, name), pdf_dir / name)
+    manifest_path = str(tmp_path / "manifest.json")
+    collection = chromadb.EphemeralClient().get_or_create_collection(f"test_{uuid.uuid4().hex}")
+
+    engine = CountingEngine()
+    result = sync_collection(collection, engine, str(pdf_dir), manifest_path)
+    assert sorted(result["indexed"]) == SAMPLE_PDFS
+    stored = collection.count()
+    assert stored == engine.embedded > 0
+
+    # Nothing changed: nothing is embedded again
+    engine = CountingEngine()
+    result = sync_collection(collection, engine, str(pdf_dir), manifest_path)
+    assert (result["indexed"], sorted(result["skipped"]), engine.embedded) == ([], SAMPLE_PDFS, 0)
+
+    # A deleted PDF loses its chunks
+    os.remove(pdf_dir / SAMPLE_PDFS[1])
+    result = sync_collection(collection, engine, str(pdf_dir), manifest_path)
+    assert result["removed"] == [SAMPLE_PDFS[1]]
+    assert collection.get(where={"filename": SAMPLE_PDFS[1]})["ids"] == []
+    assert 0 < collection.count() < stored
+    assert list(load_manifest(manifest_path)["files"]) == [SAMPLE_PDFS[0]]
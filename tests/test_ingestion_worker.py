@@ -0,0 +1,72 @@
+import os
+import shutil
+import time
+import uuid
+
+import chromadb
+import pytest
+
+import ingestion_worker
+from ingestion_worker import IngestionWorker
+from stub_server import stub_embedding
+
+PDF_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Lab4_datafiles")
+SAMPLE_PDF = "IST 644 Syllabus.pdf"
+
+
+class FlakyEngine:
+    """Embedding engine stand-in whose first `failures` calls fail."""
+
+    model = "stub-embedding"
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def embed(self, texts):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RuntimeError("embedding retries ran out")
+        return [stub_embedding(text, 16) for text in texts]
+
+
+def test_retry_delay_doubles_up_to_the_cap_and_resets(tmp_path):
+    worker = IngestionWorker(None, None, str(tmp_path), "", "", watch=False)
+    delays = []
+    for _ in range(8):
+        worker._schedule_retry(["Error processing a.pdf: boom"])
+        delays.append(worker._retry_interval)
+    assert delays[0] == 2 * ingestion_worker.RETRY_INTERVAL
+    assert delays[-1] == ingestion_worker.MAX_RETRY_INTERVAL
+    assert all(later >= earlier for earlier, later in zip(delays, delays[1:]))
+    assert worker._retry_at is not None
+
+    worker._schedule_retry([])
+    assert (worker._retry_at, worker._retry_interval) == (None, ingestion_worker.RETRY_INTERVAL)
+
+
+@pytest.mark.skipif(not os.path.exists(os.path.join(PDF_DIR, SAMPLE_PDF)), reason="sample syllabus not available")
+def test_failed_files_are_retried_without_a_new_request(tmp_path, byte_encoding, monkeypatch):
+    monkeypatch.setattr(ingestion_worker, "RETRY_INTERVAL", 0.05)
+    pdf_dir = tmp_path / "pdfs"
+    pdf_dir.mkdir()
+    shutil.copy(os.path.join(PDF_DIR, SAMPLE_PDF), pdf_dir / SAMPLE_PDF)
+    collection = chromadb.EphemeralClient().get_or_create_collection(f"test_{uuid.uuid4().hex}")
+
+    engine = FlakyEngine(failures=2)
+    worker = IngestionWorker(collection, engine, str(pdf_dir), str(tmp_path / "manifest.json"),
+                             str(tmp_path / "bm25.json"), watch=False, poll_interval=0.02)
+    worker._retry_interval = ingestion_worker.RETRY_INTERVAL
+    worker.start()
+
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        status = worker.status()
+        if status["state"] == "ready" and status["last_result"] and status["last_result"]["indexed"]:
+            break
+        time.sleep(0.02)
+    assert status["errors"] == []
+    assert status["last_result"]["indexed"] == 1
+    assert engine.calls == 3
+    assert collection.count() > 0
+    assert worker._retry_at is None
@@ -0,0 +1,28 @@
+from lexical_index import BM25Index, reciprocal_rank_fusion
+
+
+def test_rrf_prefers_ids_ranked_by_several_lists():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "b", "d"]])
+    assert set(fused[:2]) == {"b", "c"}
+    assert set(fused[2:]) == {"a", "d"}
+
+
+def test_rrf_scores_by_rank():
+    # b is second in both lists, which beats being first in only one
+    assert reciprocal_rank_fusion([["a", "b"], ["c", "b"]])[0] == "b"
+    assert reciprocal_rank_fusion([["a", "b", "c"]]) == ["a", "b", "c"]
+
+
+def test_rrf_single_list_keeps_order_and_empty_input():
+    assert reciprocal_rank_fusion([["x", "y", "z"], []]) == ["x", "y", "z"]
+    assert reciprocal_rank_fusion([]) == []
+
+
+def test_bm25_matches_course_codes_however_written():
+    index = BM25Index.build(
+        ["1", "2"],
+        ["IST 652 covers scripting for data analysis.", "IST 644 is about managing information."],
+        [{}, {}],
+    )
+    assert index.search("What is IST-652?", k=1)[0][0] == 0
+    assert index.search("ist644", k=1)[0][0] == 1
@@ -0,0 +1,73 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from openai import AsyncOpenAI
+
+from llm_gateway import LLMGateway
+from stub_server import start_background_server, stub_reply
+
+
+# Function to start a stub server and return a gateway in front of it
+def stub_gateway(server_options=None, **gateway_options):
+    server, url = start_background_server(**(server_options or {}))
+    client = AsyncOpenAI(api_key="test-key", base_url=url + "/v1")
+    return server, LLMGateway(client, **gateway_options)
+
+
+# Function to build a chat request for one question
+def question(text):
+    return {"model": "stub", "messages": [{"role": "user", "content": text}]}
+
+
+@pytest.fixture
+def slow_gateway():
+    server, gateway = stub_gateway({"latency": 0.3, "tokens_per_second": 100}, requests_per_minute=0)
+    yield gateway
+    server.shutdown()
+
+
+def test_identical_requests_in_flight_are_sent_once(slow_gateway):
+    request = question("When is the final exam?")
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        answers = list(executor.map(lambda _: slow_gateway.complete_sync(**request), range(4)))
+    assert answers == [stub_reply(request["messages"])] * 4
+    assert slow_gateway.stats() == {"requests": 1, "coalesced": 3, "in_flight": 0}
+
+
+def test_different_requests_are_not_coalesced(slow_gateway):
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        answers = list(executor.map(lambda text: slow_gateway.complete_sync(**question(text)), ["one", "two"]))
+    assert answers[0] != answers[1]
+    assert slow_gateway.stats()["requests"] == 2
+
+
+def test_a_late_joiner_gets_the_whole_stream(slow_gateway):
+    request = question("Summarize the grading policy")
+    first = slow_gateway.stream_sync(**request)
+    pieces = [next(first), next(first)]
+
+    # Joins while the first stream is half way through
+    late = "".join(slow_gateway.stream_sync(**request))
+    pieces.extend(first)
+    assert late == "".join(pieces) == stub_reply(request["messages"])
+    assert slow_gateway.stats() == {"requests": 1, "coalesced": 1, "in_flight": 0}
+
+
+def test_a_finished_stream_is_not_reused(slow_gateway):
+    request = question("Office hours?")
+    assert "".join(slow_gateway.stream_sync(**request)) == "".join(slow_gateway.stream_sync(**request))
+    assert slow_gateway.stats()["requests"] == 2
+
+
+def test_request_starts_are_paced():
+    server, gateway = stub_gateway(requests_per_minute=600)
+    try:
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda text: gateway.complete_sync(**question(text)), ["a", "b", "c", "d"]))
+        # Four starts 0.1 s apart
+        assert time.monotonic() - started >= 0.3
+        assert gateway.stats()["requests"] == 4
+    finally:
+        server.shutdown()
@@ -0,0 +1,44 @@
+import random
+
+from news_ingest import SIMHASH_BANDS, SIMHASH_MAX_DISTANCE, SeenStories, simhash, simhash_bands
+
+
+def flip_bits(value, bits):
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+
+def test_simhash_is_stable_and_ignores_case_and_spacing():
+    assert simhash("Tesla recalls 1.8M vehicles") == simhash("tesla  recalls 1.8m VEHICLES")
+    assert simhash("") == 0
+    assert 0 <= simhash("some story text") < 1 << 64
+
+
+def test_bands_split_and_reassemble_the_hash():
+    value = simhash("Nvidia shares fall after earnings")
+    width = 64 // SIMHASH_BANDS
+    bands = simhash_bands(value)
+    assert len(bands) == SIMHASH_BANDS
+    assert sum(band << (i * width) for i, band in enumerate(bands)) == value
+
+
+def test_hashes_within_the_distance_share_a_band():
+    rng = random.Random(0)
+    for _ in range(500):
+        value = rng.getrandbits(64)
+        other = flip_bits(value, rng.sample(range(64), SIMHASH_MAX_DISTANCE))
+        assert any(a == b for a, b in zip(simhash_bands(value), simhash_bands(other)))
+
+
+def test_near_duplicates_are_found_through_the_bands():
+    seen = SeenStories(":memory:")
+    value = simhash("Apple unveils a new iPhone at its September event")
+    seen.add("https://example.com/a", value)
+
+    assert seen.has_url("https://example.com/a")
+    assert seen.has_near_duplicate(value)
+    assert seen.has_near_duplicate(flip_bits(value, [0, 20, 40]))
+    # One bit off in every band: no shared band, and too far apart anyway
+    width = 64 // SIMHASH_BANDS
+    assert not seen.has_near_duplicate(flip_bits(value, [band * width for band in range(SIMHASH_BANDS)]))
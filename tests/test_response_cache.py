@@ -0,0 +1,61 @@
+import math
+
+import response_cache
+from response_cache import SemanticResponseCache, replay_response
+
+PASSAGES = [("syllabus.pdf::0", "Grading: exams 40%"), ("syllabus.pdf::1", "Projects 60%")]
+
+
+# Function to build a unit vector at `degrees` from the x axis
+def at_angle(degrees):
+    return [math.cos(math.radians(degrees)), math.sin(math.radians(degrees))]
+
+
+def test_similar_questions_over_the_same_passages_hit():
+    cache = SemanticResponseCache(threshold=0.95)
+    cache.store(at_angle(0), PASSAGES, "gpt-4o", "answer")
+    # cos(15°) = 0.966 is above the threshold, cos(25°) = 0.906 is not
+    assert cache.lookup(at_angle(15), PASSAGES, "gpt-4o") == "answer"
+    assert cache.lookup(at_angle(25), PASSAGES, "gpt-4o") is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+
+def test_passage_order_does_not_matter_but_text_model_and_ids_do():
+    cache = SemanticResponseCache()
+    cache.store([1.0, 0.0], PASSAGES, "gpt-4o", "answer")
+    assert cache.lookup([2.0, 0.0], list(reversed(PASSAGES)), "gpt-4o") == "answer"
+    assert cache.lookup([1.0, 0.0], [PASSAGES[0], ("syllabus.pdf::1", "Projects 50%")], "gpt-4o") is None
+    assert cache.lookup([1.0, 0.0], PASSAGES[:1], "gpt-4o") is None
+    assert cache.lookup([1.0, 0.0], PASSAGES, "gpt-4o-mini") is None
+
+
+def test_the_most_similar_answer_wins():
+    cache = SemanticResponseCache(threshold=0.9)
+    cache.store(at_angle(0), PASSAGES, "gpt-4o", "first")
+    cache.store(at_angle(20), PASSAGES, "gpt-4o", "second")
+    assert cache.lookup(at_angle(18), PASSAGES, "gpt-4o") == "second"
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(response_cache.time, "monotonic", lambda: now[0])
+    cache = SemanticResponseCache(ttl=60)
+    cache.store([1.0, 0.0], PASSAGES, "gpt-4o", "answer")
+    now[0] += 59
+    assert cache.lookup([1.0, 0.0], PASSAGES, "gpt-4o") == "answer"
+    now[0] += 2
+    assert cache.lookup([1.0, 0.0], PASSAGES, "gpt-4o") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = SemanticResponseCache(max_entries=2)
+    for angle in (0, 90, 180):
+        cache.store(at_angle(angle), PASSAGES, "gpt-4o", f"answer {angle}")
+    assert cache.lookup(at_angle(0), PASSAGES, "gpt-4o") is None
+    assert cache.lookup(at_angle(180), PASSAGES, "gpt-4o") == "answer 180"
+
+
+def test_replay_keeps_the_text():
+    answer = "Exams count for 40%,\n projects for 60%."
+    assert "".join(replay_response(answer)) == answer
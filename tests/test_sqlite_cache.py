@@ -0,0 +1,32 @@
+from query_cache import QueryEmbeddingCache
+from summary_cache import SummaryCache
+
+
+def test_query_embeddings_survive_in_sqlite(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = QueryEmbeddingCache(sqlite_path=path)
+    cache.put("model", "When is the exam?", [0.5, 1.0])
+
+    reopened = QueryEmbeddingCache(sqlite_path=path)
+    assert reopened.get("model", "when is the exam") == [0.5, 1.0]
+    assert reopened.get("model", "when is the exam") == [0.5, 1.0]
+    assert reopened.get("other-model", "when is the exam") is None
+    assert reopened.stats() == {"hits": 1, "disk_hits": 1, "misses": 1, "entries": 1}
+
+
+def test_memory_keeps_the_most_recently_used_entries():
+    cache = SummaryCache(max_entries=2)
+    cache.put("sha", "short", "model", "one")
+    cache.put("sha", "long", "model", "two")
+    assert cache.get("sha", "short", "model") == "one"
+    cache.put("sha", "bullets", "model", "three")
+    assert cache.get("sha", "long", "model") is None
+    assert cache.get("sha", "short", "model") == "one"
+
+
+def test_summaries_and_embeddings_can_share_a_file(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    QueryEmbeddingCache(sqlite_path=path).put("model", "question", [1.0])
+    SummaryCache(sqlite_path=path).put("sha", "short", "model", "summary")
+    assert SummaryCache(sqlite_path=path).get("sha", "short", "model") == "summary"
+    assert QueryEmbeddingCache(sqlite_path=path).get("model", "question") == [1.0]
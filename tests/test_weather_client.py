@@ -0,0 +1,77 @@
+import pytest
+
+import weather_client
+from stub_server import start_background_server
+from weather_client import WeatherClient, normalize_location
+
+
+@pytest.fixture(scope="module")
+def stub_url():
+    server, url = start_background_server()
+    yield url + "/data/2.5/weather"
+    server.shutdown()
+
+
+@pytest.mark.parametrize("location, expected", [
+    ("Syracuse, NY", "syracuse, ny"),
+    (" syracuse,ny ", "syracuse, ny"),
+    ("New   York ,  NY", "new york, ny"),
+    ("Boston,", "boston"),
+    ("", ""),
+])
+def test_normalize_location(location, expected):
+    assert normalize_location(location) == expected
+
+
+def test_lookups_are_cached_per_normalized_location(stub_url):
+    client = WeatherClient("test-key", url=stub_url, ttl=600)
+    first = client.get("Syracuse, NY")
+    assert first["location"] == "Syracuse"
+    assert client.get(" syracuse,ny") == first
+    assert (client.hits, client.misses) == (1, 1)
+
+    client.get("Boston")
+    assert (client.hits, client.misses) == (1, 2)
+
+
+def test_entries_expire_after_the_ttl(stub_url, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(weather_client.time, "monotonic", lambda: now[0])
+    client = WeatherClient("test-key", url=stub_url, ttl=60)
+
+    client.get("Syracuse, NY")
+    now[0] += 59
+    client.get("Syracuse, NY")
+    assert (client.hits, client.misses) == (1, 1)
+
+    now[0] += 2
+    client.get("Syracuse, NY")
+    assert (client.hits, client.misses) == (1, 2)
+
+
+def test_errors_are_not_cached(stub_url):
+    client = WeatherClient("test-key", url=stub_url, retries=0)
+    assert "error" in client.get("   ")
+    assert "error" in client.get("   ")
+    assert (client.hits, client.misses) == (0, 2)
+
+
+def test_cache_keeps_the_most_recently_used_locations(stub_url):
+    client = WeatherClient("test-key", url=stub_url, max_entries=2)
+    client.get("Syracuse")
+    client.get("Boston")
+    client.get("Syracuse")
+    client.get("Denver")
+    assert list(client._cache) == ["syracuse", "denver"]
+    assert client._location_locks == {}
+
+
+def test_expired_entries_are_evicted_on_write(stub_url, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(weather_client.time, "monotonic", lambda: now[0])
+    client = WeatherClient("test-key", url=stub_url, ttl=60)
+    client.get("Syracuse")
+    client.get("Boston")
+    now[0] += 61
+    client.get("Denver")
+    assert list(client._cache) == ["denver"]
@@ -0,0 +1,193 @@
+"""Lightweight per-stage timing for the hot paths of the app.
+
+Wrap a stage in `span("name")` (or decorate a function with `traced()`) and
+its duration is recorded in a process-wide histogram; `count()` adds to a
+counter (tokens, cache hits, ...). Set DOCQA_TRACE_FILE to also append one
+JSON line per span, and DOCQA_METRICS_PORT to serve the numbers in
+Prometheus text format on http://127.0.0.1:<port>/metrics.
+
+    with span("lab4.chroma_query", n_results=10) as current:
+        results = collection.query(...)
+        current.set(returned=len(results["ids"][0]))
+"""
+import functools
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+TRACE_FILE = os.environ.get("DOCQA_TRACE_FILE")
+METRICS_PORT = os.environ.get("DOCQA_METRICS_PORT")
+
+# Histogram buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, math.inf)
+# Recent durations kept per span for percentiles
+RECENT_SAMPLES = 1000
+
+_METRIC_NAME_RE = re.compile(r"[^a-zA-Z0-9_]")
+
+
+class Span:
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+
+class Recorder:
+    """Histograms of span durations and counters, safe to use from any thread."""
+
+    def __init__(self, trace_file=None):
+        self._lock = threading.Lock()
+        self._buckets = defaultdict(lambda: [0] * len(BUCKETS))
+        self._sums = defaultdict(float)
+        self._counts = defaultdict(int)
+        self._errors = defaultdict(int)
+        self._recent = defaultdict(lambda: deque(maxlen=RECENT_SAMPLES))
+        self._counters = defaultdict(float)
+        self._trace = open(trace_file, "a", buffering=1, encoding="utf-8") if trace_file else None
+
+    def observe(self, name, seconds, attributes=None, error=None):
+        with self._lock:
+            buckets = self._buckets[name]
+            for index, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    buckets[index] += 1
+                    break
+            self._sums[name] += seconds
+            self._counts[name] += 1
+            self._recent[name].append(seconds)
+            if error is not None:
+                self._errors[name] += 1
+            if self._trace is not None:
+                record = {"ts": round(time.time(), 3), "span": name, "duration_ms": round(seconds * 1000, 3)}
+                record.update(attributes or {})
+                if error is not None:
+                    record["error"] = error
+                self._trace.write(json.dumps(record, default=str) + "\n")
+
+    def count(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+
+    def summary(self):
+        """Return {span: {count, errors, mean_ms, p50_ms, p95_ms}} and {counter: value}."""
+        with self._lock:
+            spans = {}
+            for name, count in self._counts.items():
+                recent = sorted(self._recent[name])
+                spans[name] = {
+                    "count": count,
+                    "errors": self._errors[name],
+                    "mean_ms": self._sums[name] / count * 1000,
+                    "p50_ms": recent[int(0.50 * (len(recent) - 1))] * 1000,
+                    "p95_ms": recent[int(0.95 * (len(recent) - 1))] * 1000,
+                }
+            return spans, dict(self._counters)
+
+    def prometheus_text(self):
+        lines = [
+            "# TYPE docqa_span_duration_seconds histogram",
+        ]
+        with self._lock:
+            for name in sorted(self._counts):
+                cumulative = 0
+                for bound, bucket in zip(BUCKETS, self._buckets[name]):
+                    cumulative += bucket
+                    le = "+Inf" if bound == math.inf else repr(bound)
+                    lines.append(f'docqa_span_duration_seconds_bucket{{span="{name}",le="{le}"}} {cumulative}')
+                lines.append(f'docqa_span_duration_seconds_sum{{span="{name}"}} {self._sums[name]}')
+                lines.append(f'docqa_span_duration_seconds_count{{span="{name}"}} {self._counts[name]}')
+            lines.append("# TYPE docqa_span_errors_total counter")
+            for name in sorted(self._errors):
+                lines.append(f'docqa_span_errors_total{{span="{name}"}} {self._errors[name]}')
+            for name in sorted(self._counters):
+                metric = "docqa_" + _METRIC_NAME_RE.sub("_", name) + "_total"
+                lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric} {self._counters[name]}")
+        return "\n".join(lines) + "\n"
+
+
+_recorder = Recorder(TRACE_FILE)
+_server = None
+_server_lock = threading.Lock()
+
+
+# Function to get the recorder shared by the process
+def get_recorder():
+    return _recorder
+
+
+@contextmanager
+def span(name, **attributes):
+    """Time the enclosed block as `name`; exceptions are recorded and re-raised."""
+    current = Span(name, attributes)
+    started = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        _recorder.observe(name, time.perf_counter() - started, current.attributes, type(e).__name__)
+        raise
+    _recorder.observe(name, time.perf_counter() - started, current.attributes)
+
+
+def traced(name=None):
+    """Decorator timing every call of a function as a span (named after it by default)."""
+    def decorator(function):
+        span_name = name or f"{function.__module__}.{function.__name__}"
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Function to add to a counter (tokens, cache hits, ...)
+def count(name, value=1):
+    _recorder.count(name, value)
+
+
+# Function to record a duration measured elsewhere (e.g. time to first token)
+def observe(name, seconds, **attributes):
+    _recorder.observe(name, seconds, attributes)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = _recorder.prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+# Function to serve /metrics once per process (on DOCQA_METRICS_PORT unless a port is given)
+def start_metrics_server(port=None, host="127.0.0.1"):
+    global _server
+    port = port or METRICS_PORT
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, int(port)), MetricsHandler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        return _server
@@ -0,0 +1,135 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from tracing import count, span
+
+
+# OpenWeatherMap current weather endpoint (overridable, e.g. to point at stub_server.py)
+OPENWEATHER_URL = os.environ.get("OPENWEATHER_URL", "https://api.openweathermap.org/data/2.5/weather")
+
+# Weather only changes every few minutes
+DEFAULT_TTL = 600
+# Locations kept in the cache
+DEFAULT_MAX_ENTRIES = 1024
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (3.05, 10)
+
+
+# Function to normalize a location so "syracuse,ny" and " Syracuse, NY" share a cache entry
+def normalize_location(location):
+    parts = [" ".join(part.split()) for part in location.split(",")]
+    return ", ".join(part for part in parts if part).lower()
+
+
+class WeatherClient:
+    """OpenWeatherMap client with a pooled session, retries and a TTL cache.
+
+    Successful lookups are cached per normalized location for `ttl`
+    seconds in an LRU of at most `max_entries` locations; expired entries
+    are evicted on every write and errors are not cached. Concurrent
+    lookups of the same location wait for a single request instead of each
+    sending their own.
+    """
+
+    def __init__(self, api_key, url=OPENWEATHER_URL, ttl=DEFAULT_TTL, timeout=DEFAULT_TIMEOUT, retries=3,
+                 max_entries=DEFAULT_MAX_ENTRIES):
+        self.api_key = api_key
+        self.url = url
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        retry = Retry(
+            total=retries,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=("GET",),
+            respect_retry_after_header=True,
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        # Normalized location -> [lock, number of lookups using it]; dropped when unused
+        self._location_locks = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, location):
+        """Return the current weather of `location` as a dict, or {"error": ...}."""
+        key = normalize_location(location)
+        with self._lock:
+            location_lock = self._location_locks.setdefault(key, [threading.Lock(), 0])
+            location_lock[1] += 1
+
+        try:
+            with location_lock[0]:
+                return self._get(key, location)
+        finally:
+            with self._lock:
+                location_lock[1] -= 1
+                if location_lock[1] == 0:
+                    del self._location_locks[key]
+
+    def _get(self, key, location):
+        # Called with the location's lock held
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] > time.monotonic():
+                self._cache.move_to_end(key)
+                self.hits += 1
+                cached = cached[1]
+            else:
+                self.misses += 1
+                cached = None
+        if cached is not None:
+            count("weather.cache_hits")
+            return cached
+
+        count("weather.cache_misses")
+        with span("weather.fetch", location=key):
+            weather = self._fetch(location)
+        if "error" not in weather:
+            self._store(key, weather)
+        return weather
+
+    def _store(self, key, weather):
+        now = time.monotonic()
+        with self._lock:
+            for expired in [k for k, (expires_at, _) in self._cache.items() if expires_at <= now]:
+                del self._cache[expired]
+            self._cache[key] = (now + self.ttl, weather)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def _fetch(self, location):
+        try:
+            response = self.session.get(
+                self.url,
+                params={"q": location, "appid": self.api_key, "units": "metric"},
+                timeout=self.timeout,
+            )
+        except requests.RequestException:
+            return {"error": "Could not retrieve weather data."}
+        if response.status_code != 200:
+            return {"error": "Could not retrieve weather data."}
+        data = response.json()
+        return {
+            "location": data["name"],
+            "temperature": round(data["main"]["temp"], 2),
+            "feels_like": round(data["main"]["feels_like"], 2),
+            "temp_min": round(data["main"]["temp_min"], 2),
+            "temp_max": round(data["main"]["temp_max"], 2),
+            "humidity": round(data["main"]["humidity"], 2),
+            "weather": data["weather"][0]["description"]
+        }